@@ -0,0 +1,91 @@
+"""
+Benchmarks calling a local stub HTTPS bridge, with a self-signed certificate,
+through ``urlopen`` against the pooled TCP transport, with and without TLS
+session resumption. Reports the TLS handshakes and the CPU time per request,
+of the client alone and of the whole process, stub included.
+
+Run it from the root of the repository::
+
+    python -m benchmarks.bench_tls --requests 500
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import os
+import time
+
+from crossbarhttp import Client, TCPTransport
+from tests.stub import CA_FILE, StubBridge
+
+# CPU time of the calling thread only, leaving out the stub threads.
+cpu_time = getattr(time, 'thread_time', None) or time.process_time
+
+
+def bench(client, bridge, requests):
+    """
+    Calls ``requests`` times a procedure of the bridge.
+
+    :return: A ``(latency, cpu, total_cpu, handshakes, resumed)`` tuple, with
+    the mean latency and CPU times in seconds, and the full and resumed
+    handshakes per request.
+    """
+    client.call('test.add', 0, 0)
+    handshakes = bridge.handshake_count
+    resumed = bridge.resumed_count
+
+    started = time.time()
+    cpu_started, total_cpu_started = cpu_time(), time.process_time()
+    for i in range(requests):
+        client.call('test.add', i, 1)
+    elapsed = time.time() - started
+    cpu = cpu_time() - cpu_started
+    total_cpu = time.process_time() - total_cpu_started
+
+    resumed = bridge.resumed_count - resumed
+    handshakes = bridge.handshake_count - handshakes - resumed
+
+    return (
+        elapsed / requests, cpu / requests, total_cpu / requests,
+        handshakes / float(requests), resumed / float(requests)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=300)
+    options = parser.parse_args()
+
+    # Makes the default SSL context of ``urlopen`` trust the stub.
+    os.environ['SSL_CERT_FILE'] = CA_FILE
+
+    with StubBridge(tls=True) as bridge:
+        url = bridge.url + '/call'
+        results = [
+            ('urlopen', Client(url)),
+            ('New connections', Client(url, transport=TCPTransport(
+                pool_size=0, cafile=CA_FILE, resume_sessions=False
+            ))),
+            ('New connections, resumed', Client(url, transport=TCPTransport(
+                pool_size=0, cafile=CA_FILE
+            ))),
+            ('Pooled connections', Client(url, cafile=CA_FILE)),
+        ]
+
+        print('{0:<26} {1:>11} {2:>11} {3:>11} {4:>9} {5:>9}'.format(
+            '', 'us/request', 'client CPU', 'total CPU', 'full', 'resumed'
+        ))
+        for name, client in results:
+            latency, cpu, total_cpu, handshakes, resumed = bench(
+                client, bridge, options.requests
+            )
+            print(
+                '{0:<26} {1:11.1f} {2:11.1f} {3:11.1f} {4:9.2f} {5:9.2f}'
+                .format(
+                    name, latency * 1e6, cpu * 1e6, total_cpu * 1e6,
+                    handshakes, resumed
+                )
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmarks publishing to a local stub HTTP bridge over TCP loopback, through
+``urlopen`` and through pooled connections, against publishing over a pooled
+Unix domain socket. The pooled TCP row tells apart the gain of keeping
+connections open from the gain of skipping the TCP stack.
+
+Run it from the root of the repository::
+
+    python -m benchmarks.bench_transport --requests 2000
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import timeit
+
+from crossbarhttp import Client, TCPTransport
+from tests.stub import StubBridge
+
+
+def bench(client, requests):
+    """
+    Publishes ``requests`` events and returns the mean latency in seconds.
+    """
+    client.publish('bench.warmup')
+    elapsed = timeit.timeit(
+        lambda: client.publish('bench.event', 'payload'),
+        number=requests
+    )
+    return elapsed / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    options = parser.parse_args()
+
+    tcp_bridge = StubBridge()
+    unix_bridge = StubBridge(unix_socket=True)
+
+    with tcp_bridge, unix_bridge:
+        results = [
+            ('TCP loopback (urlopen)', Client(tcp_bridge.url + '/publish')),
+            ('TCP loopback (pooled)', Client(
+                tcp_bridge.url + '/publish', transport=TCPTransport()
+            )),
+            ('Unix domain socket', Client(unix_bridge.url + '/publish')),
+        ]
+
+        for name, client in results:
+            latency = bench(client, options.requests)
+            print('{0:<28} {1:8.1f} us/request {2:10.0f} requests/s'.format(
+                name, latency * 1e6, 1 / latency
+            ))
+
+
+if __name__ == '__main__':
+    main()
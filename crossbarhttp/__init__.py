@@ -1,5 +1,28 @@
+import sys
+
+from .compat import import_lazily
 from .crossbarhttp import (
     Client, ClientBadHost, ClientBadUrl, ClientBaseException,
     ClientCallRuntimeError, ClientMissingParams, ClientNoCalleeRegistered,
-    ClientSignatureError
+    ClientQueueFull, ClientSignatureError
 )
+from .latency import LatencyTracker
+
+# Optional features, only imported when they are first used.
+LAZY_IMPORTS = {
+    'HTTPTransport': 'crossbarhttp.transport',
+    'Recorder': 'crossbarhttp.recording',
+    'Replayer': 'crossbarhttp.replay',
+    'Scheduler': 'crossbarhttp.scheduler',
+    'TCPTransport': 'crossbarhttp.transport',
+    'UnixSocketTransport': 'crossbarhttp.transport',
+}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        return import_lazily(globals(), LAZY_IMPORTS, name)
+else:
+    from .recording import Recorder
+    from .replay import Replayer
+    from .scheduler import Scheduler
+    from .transport import HTTPTransport, TCPTransport, UnixSocketTransport
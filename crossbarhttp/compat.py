@@ -1,22 +1,35 @@
 from __future__ import unicode_literals
 
-import hashlib
-import hmac
-import json
 import sys
 
 
 # Compatibility workaround for `urllib`.
 if sys.version_info >= (3,):
     # Python 3
-    from http.client import HTTPException
-    from urllib.parse import urlencode, urlparse
-    from urllib.request import HTTPError, Request, URLError, urlopen
+    from collections.abc import Iterator
+    from queue import Empty, Queue
+    from time import monotonic
+    from urllib.parse import unquote, urlencode, urlparse
+
+    # Heavy modules, only imported when the first request is sent.
+    LAZY_IMPORTS = {
+        'BadStatusLine': 'http.client',
+        'HTTPConnection': 'http.client',
+        'HTTPException': 'http.client',
+        'HTTPSConnection': 'http.client',
+        'HTTPError': 'urllib.error',
+        'URLError': 'urllib.error',
+        'Request': 'urllib.request',
+        'urlopen': 'urllib.request',
+    }
 
     def compute_hmac(body, key, secret, sequence, nonce, timestamp):
         """
         Performs the HMAC computation for signed requests, Python 3 compatible.
         """
+        import hashlib
+        import hmac
+
         sequence = str(sequence)
         nonce = str(nonce)
 
@@ -25,7 +38,12 @@ if sys.version_info >= (3,):
         hm.update(bytes(timestamp, 'utf-8'))
         hm.update(bytes(sequence, 'utf-8'))
         hm.update(bytes(nonce, 'utf-8'))
-        hm.update(bytes(body, 'utf-8'))
+        if isinstance(body, str):
+            hm.update(bytes(body, 'utf-8'))
+        else:
+            # Streamed body, as ``bytes`` chunks.
+            for chunk in body:
+                hm.update(chunk)
 
         return hm
 
@@ -39,6 +57,9 @@ if sys.version_info >= (3,):
         not specified, the global default timeout will be used.
         :return: The response data in a JSON payload.
         """
+        import json
+
+        urlopen = _module.urlopen
         if timeout is None:
             response = urlopen(request).read()
         else:
@@ -48,21 +69,42 @@ if sys.version_info >= (3,):
 else:
     # Python 2
     from builtins import bytes
-    from httplib import HTTPException
-    from urllib import urlencode
-    from urllib2 import HTTPError, Request, URLError, urlopen
+    from collections import Iterator
+    from Queue import Empty, Queue
+    from time import time as monotonic
+    from urllib import unquote, urlencode
     from urlparse import urlparse
 
+    # Heavy modules, only imported when the first request is sent.
+    LAZY_IMPORTS = {
+        'BadStatusLine': 'httplib',
+        'HTTPConnection': 'httplib',
+        'HTTPException': 'httplib',
+        'HTTPSConnection': 'httplib',
+        'HTTPError': 'urllib2',
+        'URLError': 'urllib2',
+        'Request': 'urllib2',
+        'urlopen': 'urllib2',
+    }
+
     def compute_hmac(body, key, secret, sequence, nonce, timestamp):
         """
         Performs the HMAC computation for signed requests, Python 2 compatible.
         """
+        import hashlib
+        import hmac
+
         hm = hmac.new(secret, None, hashlib.sha256)
         hm.update(key)
         hm.update(timestamp)
         hm.update(str(sequence))
         hm.update(str(nonce))
-        hm.update(body)
+        if isinstance(body, basestring):
+            hm.update(body)
+        else:
+            # Streamed body, as ``bytes`` chunks.
+            for chunk in body:
+                hm.update(chunk)
 
         return hm
 
@@ -75,9 +117,58 @@ else:
         :param timeout: The timeout in seconds, passed from the ``Client``.
         :return: The response data.
         """
+        import json
+
+        urlopen = _module.urlopen
         if timeout is None:
             response = urlopen(request).read()
         else:
             response = urlopen(request, timeout=timeout).read()
 
         return json.loads(response)
+
+
+# Whether ``urlopen`` and ``HTTPConnection`` accept an iterable as the request
+# body, and send it with chunked transfer encoding.
+CHUNKED_UPLOADS = sys.version_info >= (3, 6)
+
+# Whether ``SSLContext.wrap_socket`` can resume a TLS session.
+TLS_SESSIONS = sys.version_info >= (3, 6)
+
+
+def import_lazily(namespace, imports, name):
+    """
+    Imports a name on first use and caches it in the module namespace, so the
+    module ``__getattr__`` is not called again for it.
+
+    :param namespace: The ``globals()`` of the module the name belongs to.
+    :param imports: Mapping of the lazily imported names to the absolute name
+    of the module they come from.
+    :param name: The name to import.
+    :return: The imported object.
+    """
+    try:
+        module_name = imports[name]
+    except KeyError:
+        raise AttributeError(
+            'module {0!r} has no attribute {1!r}'.format(
+                namespace['__name__'], name
+            )
+        )
+
+    module = __import__(str(module_name), fromlist=[str(name)])
+    value = namespace[name] = getattr(module, name)
+
+    return value
+
+
+# Lazily imported names must be looked up as attributes of this module.
+_module = sys.modules[__name__]
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        return import_lazily(globals(), LAZY_IMPORTS, name)
+else:
+    # No module ``__getattr__`` (PEP 562) support: import everything now.
+    for _name in LAZY_IMPORTS:
+        import_lazily(globals(), LAZY_IMPORTS, _name)
@@ -0,0 +1,160 @@
+from __future__ import unicode_literals
+
+import sys
+import threading
+
+from .compat import Empty, Queue
+
+
+class ThreadingBackend(object):
+    """
+    Concurrency primitives of the standard library. Background work runs in
+    daemon threads.
+    """
+    name = 'threading'
+
+    Empty = Empty
+    Event = threading.Event
+    Lock = threading.Lock
+    Queue = Queue
+
+    @property
+    def socket(self):
+        import socket
+        return socket
+
+    @property
+    def ssl(self):
+        import ssl
+        return ssl
+
+    def wrap_socket(self, context, sock, server_hostname, session=None):
+        """
+        Wraps a connected socket with TLS.
+
+        :param context: The ``ssl.SSLContext``.
+        :param sock: The socket.
+        :param server_hostname: The host name the certificate must match.
+        :param session: A TLS session to resume, if any.
+        """
+        options = {'server_hostname': server_hostname}
+        if session is not None:
+            options['session'] = session
+        return context.wrap_socket(sock, **options)
+
+    def spawn(self, function, *args, **kwargs):
+        """
+        Runs ``function`` in the background.
+        """
+        thread = threading.Thread(target=function, args=args, kwargs=kwargs)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def sleep(self, seconds):
+        import time
+        time.sleep(seconds)
+
+
+class GeventBackend(object):
+    """
+    Cooperative primitives of gevent. Background work runs in greenlets, and
+    sockets yield to the hub instead of blocking it, even without
+    monkey-patching.
+    """
+    name = 'gevent'
+
+    def __init__(self):
+        import gevent
+        import gevent.event
+        import gevent.lock
+        import gevent.queue
+        import gevent.socket
+        import gevent.ssl
+
+        self.Empty = gevent.queue.Empty
+        self.Event = gevent.event.Event
+        self.Lock = gevent.lock.Semaphore
+        self.Queue = gevent.queue.Queue
+        self.socket = gevent.socket
+        self.ssl = gevent.ssl
+        self.spawn = gevent.spawn
+        self.sleep = gevent.sleep
+
+    def wrap_socket(self, context, sock, server_hostname, session=None):
+        # ``gevent.ssl.create_default_context`` and user given contexts are
+        # the standard library ones, whose sockets would block the hub.
+        return self.ssl.SSLSocket(
+            sock=sock, server_hostname=server_hostname, _context=context,
+            _session=session
+        )
+
+
+class EventletBackend(object):
+    """
+    Cooperative primitives of eventlet. Background work runs in green threads,
+    and sockets yield to the hub instead of blocking it, even without
+    monkey-patching.
+    """
+    name = 'eventlet'
+
+    def __init__(self):
+        import eventlet
+        import eventlet.queue
+        import eventlet.semaphore
+        from eventlet.green import socket, ssl, threading as green_threading
+
+        self.Empty = eventlet.queue.Empty
+        self.Event = green_threading.Event
+        self.Lock = eventlet.semaphore.Semaphore
+        self.Queue = eventlet.queue.Queue
+        self.socket = socket
+        self.ssl = ssl
+        self.spawn = eventlet.spawn
+        self.sleep = eventlet.sleep
+
+    def wrap_socket(self, context, sock, server_hostname, session=None):
+        # User given contexts are the standard library ones, whose sockets
+        # would block the hub.
+        options = {'server_hostname': server_hostname, '_context': context}
+        if session is not None:
+            options['session'] = session
+        return self.ssl.GreenSSLSocket(sock, **options)
+
+
+BACKENDS = {
+    'threading': ThreadingBackend,
+    'gevent': GeventBackend,
+    'eventlet': EventletBackend,
+}
+
+
+def get_backend(cooperative=False):
+    """
+    Chooses the concurrency primitives the client runs on.
+
+    :param cooperative: ``False`` for the standard library ones, the name of a
+    backend (``'gevent'`` or ``'eventlet'``) or ``True`` to pick whichever of
+    gevent or eventlet has already been imported.
+    :return: The backend instance.
+    """
+    if cooperative is True:
+        for name in ('gevent', 'eventlet'):
+            if name in sys.modules:
+                cooperative = name
+                break
+        else:
+            raise ValueError(
+                'Cooperative mode requires gevent or eventlet to be imported'
+            )
+    elif not cooperative:
+        cooperative = 'threading'
+
+    try:
+        backend = BACKENDS[cooperative]
+    except KeyError:
+        raise ValueError(
+            'Unknown cooperative backend: {0!r}'.format(cooperative)
+        )
+
+    return backend()
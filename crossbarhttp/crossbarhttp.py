@@ -1,18 +1,32 @@
 from __future__ import unicode_literals
 
-import base64
-import datetime
-import json
 import logging
-from random import randint
+import sys
 
 from .compat import (
-    compute_hmac, HTTPError, HTTPException, Request, send_request, urlencode,
-    URLError, urlparse
+    CHUNKED_UPLOADS, compute_hmac, import_lazily, LAZY_IMPORTS, monotonic,
+    send_request, unquote, urlencode, urlparse
 )
+from .cooperative import get_backend
+from .streaming import (
+    count_bytes, is_streamed, iter_chunks, iter_json, replay, spool,
+    spooled_file
+)
+from .latency import LatencyTracker
 
 logger = logging.getLogger('crossbarhttp')
 
+# ``HTTPError``, ``HTTPException``, ``Request`` and ``URLError`` come from
+# heavy modules, imported by ``__getattr__`` when the first request is sent.
+# They must be looked up as attributes of this module.
+_module = sys.modules[__name__]
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        return import_lazily(globals(), LAZY_IMPORTS, name)
+else:
+    from .compat import HTTPError, HTTPException, Request, URLError
+
 
 class ClientBaseException(Exception):
     """
@@ -64,9 +78,21 @@ class ClientCallRuntimeError(ClientBaseException):
     pass
 
 
+class ClientQueueFull(ClientBaseException):
+    """
+    Exception thrown when a request cannot be queued in a ``Scheduler``.
+    """
+    pass
+
+
 class Client(object):
 
-    def __init__(self, url, key=None, secret=None, timeout=None, silently=False):
+    def __init__(self, url, key=None, secret=None, timeout=None,
+                 silently=False, adaptive_timeout=False, hedge_procedures=None,
+                 hedge_urls=None, latency_tracker=None, unix_socket=None,
+                 transport=None, cooperative=False, dns_ttl=None, warmup=0,
+                 ssl_context=None, cafile=None, certfile=None, keyfile=None,
+                 recorder=None):
         """
         Creates a client to connect to the HTTP bridge services.
 
@@ -76,6 +102,51 @@ class Client(object):
         :param timeout: Time to wait for the connection, in seconds.
         :param silently: Whether the client should raise an exception or not if
         the request fails. Defaults to raise exceptions on request failure.
+        :param adaptive_timeout: Whether the timeout of every request should be
+        derived from the observed latency of its procedure or topic. The static
+        ``timeout`` is still used as an upper bound.
+        :param hedge_procedures: Procedures that are safe to call twice. Calls
+        to them are hedged: if no response arrives before the observed p95
+        latency, a duplicate request is sent and the first response wins.
+        :param hedge_urls: Alternative bridge URLs hedged requests are sent to,
+        in round-robin. Defaults to the client ``url``.
+        :param latency_tracker: A ``LatencyTracker`` instance, to share latency
+        statistics between clients or tune its window. A new one is created by
+        default.
+        :param unix_socket: Path of a Unix domain socket to talk HTTP to the
+        Crossbar.io node through. It can also be given in the URL, using the
+        ``http+unix`` scheme and the percent-encoded path as the host, like
+        ``http+unix://%2Fvar%2Frun%2Fcrossbar.sock/publish``.
+        :param transport: A transport instance to send the requests with, like
+        a ``UnixSocketTransport`` shared between clients. Defaults to
+        ``urlopen``.
+        :param cooperative: Whether to run on the cooperative primitives of
+        gevent or eventlet: ``'gevent'``, ``'eventlet'`` or ``True`` to pick
+        the one already imported. Connections are then pooled over green
+        sockets, so requests yield to the hub even without monkey-patching.
+        :param dns_ttl: Seconds the resolved address of the node is cached.
+        Setting it makes the client use a pool of persistent connections
+        instead of ``urlopen``. Pooled clients cache it for 60 seconds by
+        default.
+        :param warmup: Number of connections to open in the background when
+        the client is created, so the first requests do not pay the
+        connection setup. Setting it makes the client use a pool of persistent
+        connections instead of ``urlopen``.
+        :param ssl_context: The ``ssl.SSLContext`` for HTTPS bridges, which
+        may be shared between clients. Setting it makes the client use a pool
+        of persistent connections, resuming TLS sessions, instead of
+        ``urlopen``, which performs a full TLS handshake for every request.
+        :param cafile: Path of the CA bundle the bridge certificate must be
+        signed by, to create the SSL context. Setting it makes the client use
+        a pool of persistent connections too.
+        :param certfile: Path of the client certificate, for bridges requiring
+        one, to create the SSL context. It may contain the private key too.
+        Setting it makes the client use a pool of persistent connections too.
+        :param keyfile: Path of the private key of ``certfile``.
+        :param recorder: A ``Recorder``, which may be shared between clients,
+        or the path of a capture file to record to. Every publish and call is
+        then recorded, with its timing, payload size, outcome and latency, to
+        be played back later with a ``Replayer``.
         """
         # URL sanity check.
         try:
@@ -84,6 +155,38 @@ class Client(object):
         except (AssertionError, AttributeError):
             raise ClientBadUrl('Invalid Crossbar node URL')
 
+        if unix_socket is None and parsed.scheme == 'http+unix':
+            unix_socket = unquote(parsed.netloc)
+        backend = get_backend(cooperative)
+
+        if transport is None and unix_socket is not None:
+            from .transport import UnixSocketTransport
+            transport = UnixSocketTransport(unix_socket, backend=backend)
+        elif transport is None and (
+                cooperative or dns_ttl or warmup or ssl_context or cafile or
+                certfile):
+            # In cooperative mode, ``urlopen`` would block the whole hub
+            # unless the standard library is monkey-patched.
+            from .transport import TCPTransport
+            options = {
+                'pool_size': max(4, warmup),
+                'backend': backend,
+                'ssl_context': ssl_context,
+                'cafile': cafile,
+                'certfile': certfile,
+                'keyfile': keyfile,
+            }
+            if dns_ttl is not None:
+                options['dns_ttl'] = dns_ttl
+            transport = TCPTransport(**options)
+
+        owns_recorder = recorder is not None and not hasattr(
+            recorder, 'record'
+        )
+        if owns_recorder:
+            from .recording import Recorder
+            recorder = Recorder(recorder)
+
         if key is None:
             key = ''
         if secret is None:
@@ -95,6 +198,79 @@ class Client(object):
         self.sequence = 1
         self.timeout = timeout
         self.silently = silently
+        self.adaptive_timeout = adaptive_timeout
+        self.hedge_procedures = frozenset(hedge_procedures or ())
+        self.hedge_urls = list(hedge_urls or [url])
+        self.latency = latency_tracker or LatencyTracker()
+        self.recorder = recorder
+        self._owns_recorder = owns_recorder
+        self._hedge_index = 0
+        self.transport = transport
+        self.backend = backend
+        self._lock = backend.Lock()
+
+        if warmup:
+            self.warmup(warmup, background=True)
+
+    def warmup(self, connections=1, background=False):
+        """
+        Opens connections to the bridge service, and to the hedge URLs, ahead
+        of the first requests. Only pooled transports can be warmed up.
+
+        :param connections: Number of connections to open to every node.
+        :param background: Whether to open them in the background, instead of
+        waiting for them.
+        :return: The number of connections opened, or ``None`` if they are
+        opened in the background.
+        """
+        if not hasattr(self.transport, 'warmup'):
+            logger.debug('Nothing to warm up without a pooled transport')
+            return 0
+
+        if background:
+            self.backend.spawn(self._warmup, connections, background=True)
+            return None
+
+        return self._warmup(connections)
+
+    def _warmup(self, connections, background=False):
+        """
+        Opens the connections of ``warmup``.
+        """
+        urls = [self.url] + [url for url in self.hedge_urls if url != self.url]
+
+        opened = 0
+        for url in urls:
+            try:
+                opened += self.transport.warmup(
+                    url, connections, timeout=self.timeout
+                )
+            except _module.URLError as e:
+                if not background:
+                    raise ClientBadHost(str(e))
+                logger.warning(
+                    "Couldn't warm up connections to %s: %s", url, e
+                )
+
+        logger.debug('Warmed up %d connections', opened)
+        return opened
+
+    def close(self):
+        """
+        Closes the idle connections of the transport, and the recorder if the
+        client created it from a path. A recorder given as a ``Recorder`` is
+        left open, since it may be shared with other clients.
+        """
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+        if self._owns_recorder:
+            self.recorder.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def publish(self, topic, *args, **kwargs):
         """
@@ -116,14 +292,14 @@ class Client(object):
         }
 
         try:
-            response = self._make_api_call("POST", self.url, json_params=params)
+            response = self._timed_api_call(topic, params)
             return response["id"]
         except (
             ClientBadHost,
             ClientBadUrl,
             ClientMissingParams,
             ClientSignatureError,
-            HTTPException
+            _module.HTTPException
         ):
             logger.exception("Couldn't publish message: %r", params)
             if self.silently is True:
@@ -148,7 +324,11 @@ class Client(object):
             "kwargs": kwargs
         }
 
-        response = self._make_api_call("POST", self.url, json_params=params)
+        # A streamed call cannot be sent twice.
+        hedged = (
+            procedure in self.hedge_procedures and not is_streamed(params)
+        )
+        response = self._timed_api_call(procedure, params, hedged=hedged)
 
         value = None
         if "args" in response and len(response["args"]) > 0:
@@ -163,7 +343,177 @@ class Client(object):
 
         return value
 
-    def _compute_signature(self, body):
+    def _timed_api_call(self, key, params, hedged=False):
+        """
+        Performs a POST API call, applying the adaptive timeout of ``key`` if
+        enabled and recording the latency of successful responses, if needed
+        for adaptive timeouts or hedging. The request is recorded too, if the
+        client has a recorder.
+
+        Requests failing once their timeout has run out are recorded as
+        samples of the timeout, since the actual latency is at least that.
+        Otherwise, a procedure slowing down beyond its adaptive timeout would
+        time out for good, without ever raising the timeout.
+
+        :param key: The procedure or topic the request is for.
+        :param params: The parameters intended to be JSON serialized.
+        :param hedged: Whether the request should be hedged.
+        :return: JSON response.
+        """
+        if self.adaptive_timeout:
+            timeout = self.latency.timeout_for(key, self.timeout)
+        else:
+            timeout = self.timeout
+
+        # Filled in with the size of the request body, to be recorded.
+        request_info = {} if self.recorder is not None else None
+
+        started = monotonic()
+        try:
+            if hedged:
+                response = self._hedged_api_call(
+                    key, params, timeout, request_info
+                )
+            else:
+                response = self._make_api_call(
+                    "POST", self.url, json_params=params, timeout=timeout,
+                    request_info=request_info
+                )
+        except Exception as e:
+            latency = monotonic() - started
+            if (self._tracks_latency(key) and timeout is not None and
+                    latency >= timeout * 0.95):
+                # Timed out: the latency is at least the timeout.
+                self.latency.record(key, max(latency, timeout))
+            self._record(
+                key, params, request_info, type(e).__name__, started, latency
+            )
+            raise
+
+        latency = monotonic() - started
+        if self._tracks_latency(key):
+            self.latency.record(key, latency)
+        if self.recorder is not None:
+            outcome = "ok"
+            if isinstance(response, dict) and "error" in response:
+                outcome = response["error"]
+            self._record(key, params, request_info, outcome, started, latency)
+
+        return response
+
+    def _tracks_latency(self, key):
+        """
+        Tells whether the latency of a procedure or topic must be tracked,
+        which is only needed for adaptive timeouts and hedged calls.
+        """
+        return self.adaptive_timeout or key in self.hedge_procedures
+
+    def _record(self, key, params, request_info, outcome, started, latency):
+        """
+        Records a request with the recorder of the client, if any.
+
+        :param key: The procedure or topic the request was for.
+        :param params: The parameters of the request.
+        :param request_info: The ``request_info`` filled in by
+        ``_make_api_call``.
+        :param outcome: ``'ok'``, the WAMP error URI or the name of the
+        exception raised.
+        :param started: The ``monotonic`` time the request was sent at.
+        :param latency: The latency of the request, in seconds.
+        """
+        if self.recorder is None:
+            return
+
+        method = "publish" if "topic" in params else "call"
+        self.recorder.record(
+            method, key, request_info.get("size"), outcome, latency, started
+        )
+
+    def _next_hedge_url(self):
+        """
+        Picks the next bridge URL for a hedged request, in round-robin.
+        """
+        with self._lock:
+            url = self.hedge_urls[self._hedge_index % len(self.hedge_urls)]
+            self._hedge_index += 1
+
+        return url
+
+    def _hedged_api_call(self, procedure, params, timeout,
+                         request_info=None):
+        """
+        Performs a hedged POST API call.
+
+        The request is sent to the client URL. If no response arrived once the
+        p95 latency of the procedure has passed, a duplicate request is sent to
+        the next hedge URL and the first successful response is returned.
+
+        The request left behind is cancelled, if the transport supports it
+        like the pooled transports do: its connection is shut down, so it
+        stops waiting for the response. Otherwise, like through ``urlopen``,
+        it is left to finish in the background and its outcome discarded.
+        Either way, the node may have processed it already.
+
+        :param procedure: The procedure being called.
+        :param params: The parameters intended to be JSON serialized.
+        :param timeout: The timeout of every single request, in seconds.
+        :param request_info: A dict to fill in with the size of the request
+        body, like ``_make_api_call`` does.
+        :return: JSON response.
+        """
+        delay = self.latency.percentile(procedure, 95)
+        if delay is None:
+            # Not enough history to know what "slow" means for this procedure.
+            return self._make_api_call(
+                "POST", self.url, json_params=params, timeout=timeout,
+                request_info=request_info
+            )
+
+        results = self.backend.Queue()
+        cancellations = []
+
+        def attempt(url, cancellation):
+            try:
+                response = self._make_api_call(
+                    "POST", url, json_params=params, timeout=timeout,
+                    request_info=request_info, cancellation=cancellation
+                )
+                results.put((True, response))
+            except Exception as e:
+                results.put((False, e))
+
+        def start(url):
+            cancellation = None
+            if hasattr(self.transport, 'cancellation'):
+                cancellation = self.transport.cancellation()
+                cancellations.append(cancellation)
+            self.backend.spawn(attempt, url, cancellation)
+
+        start(self.url)
+        pending = 1
+        try:
+            outcome = results.get(timeout=delay)
+        except self.backend.Empty:
+            logger.debug('Hedging call to %r after %.3fs', procedure, delay)
+            start(self._next_hedge_url())
+            pending += 1
+            outcome = results.get()
+
+        error = None
+        while True:
+            pending -= 1
+            succeeded, value = outcome
+            if succeeded:
+                for cancellation in cancellations:
+                    cancellation.cancel()
+                return value
+            if error is None:
+                error = value
+            if pending == 0:
+                raise error
+            outcome = results.get()
+
+    def _compute_signature(self, body, sequence=None):
         """
         Computes the signature.
 
@@ -173,8 +523,19 @@ class Client(object):
         Reference code is at:
         https://github.com/crossbario/crossbar/blob/master/crossbar/adapter/rest/common.py
 
+        :param body: The request body, as text or as an iterable of ``bytes``
+        chunks.
+        :param sequence: The sequence number of the request. Defaults to
+        ``self.sequence``.
         :return: (signature, nonce, timestamp)
         """
+        import base64
+        import datetime
+        from random import randint
+
+        if sequence is None:
+            sequence = self.sequence
+
         timestamp = datetime.datetime.utcnow().isoformat() + 'Z'
         nonce = randint(0, 2 ** 53)
 
@@ -182,7 +543,7 @@ class Client(object):
             body=body,
             key=self.key,
             secret=self.secret,
-            sequence=self.sequence,
+            sequence=sequence,
             nonce=nonce,
             timestamp=timestamp
         )
@@ -190,18 +551,32 @@ class Client(object):
 
         return signature, nonce, timestamp
 
-    def _make_api_call(self, method, url, json_params=None):
+    def _make_api_call(self, method, url, json_params=None, timeout=None,
+                       request_info=None, cancellation=None):
         """
         Performs the REST API Call.
 
         :param method: HTTP Method
         :param url:  The URL
         :param json_params: The parameters intended to be JSON serialized
+        :param timeout: The timeout in seconds. Defaults to ``self.timeout``.
+        :param request_info: A dict to fill in with the ``size`` of the
+        request body, in bytes. Streamed bodies are counted as they are sent.
+        :param cancellation: A ``Cancellation`` of the transport, to cancel
+        the request with.
         :return: JSON response.
         """
+        import json
+
         logger.debug('Request: %s %s', method, url)
 
-        if json_params is not None:
+        streamed = is_streamed(json_params)
+        if streamed:
+            encoded_params = iter_chunks(iter_json(json_params))
+            headers = {'Content-Type': 'application/json'}
+            logger.debug('Params: streamed')
+            byte_encoded_params = encoded_params
+        elif json_params is not None:
             encoded_params = json.dumps(json_params)
             headers = {'Content-Type': 'application/json'}
             logger.debug('Params: %s', encoded_params)
@@ -211,11 +586,29 @@ class Client(object):
             headers = {}
             byte_encoded_params = None
 
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            sequence = self.sequence
+            self.sequence += 1
+
         if self.key and self.secret and encoded_params:
-            signature, nonce, timestamp = self._compute_signature(encoded_params)
+            if streamed:
+                # The signature goes in the URL, so the body is spooled while
+                # the signature is computed over it, then sent from the spool.
+                spool_file = spooled_file()
+                signature, nonce, timestamp = self._compute_signature(
+                    spool(encoded_params, spool_file), sequence
+                )
+                byte_encoded_params = replay(spool_file)
+            else:
+                signature, nonce, timestamp = self._compute_signature(
+                    encoded_params, sequence
+                )
             params = urlencode({
                 "timestamp": timestamp,
-                "seq": str(self.sequence),
+                "seq": str(sequence),
                 "nonce": nonce,
                 "signature": signature,
                 "key": self.key
@@ -224,21 +617,39 @@ class Client(object):
 
             url = '{0}?{1}'.format(url, params)
 
-        self.sequence += 1
+        if streamed and not CHUNKED_UPLOADS:
+            byte_encoded_params = b''.join(byte_encoded_params)
+
+        if request_info is not None:
+            if isinstance(byte_encoded_params, (bytes, bytearray)):
+                request_info["size"] = len(byte_encoded_params)
+            else:
+                request_info["size"] = 0
+                if byte_encoded_params is not None:
+                    byte_encoded_params = count_bytes(
+                        byte_encoded_params, request_info
+                    )
 
         try:
-            request = Request(url, byte_encoded_params, headers)
+            request = _module.Request(url, byte_encoded_params, headers)
             request.get_method = lambda: method
-            response = send_request(request, self.timeout)
+            if self.transport is None:
+                response = send_request(request, timeout)
+            elif cancellation is not None:
+                response = self.transport.send_request(
+                    request, timeout, cancellation=cancellation
+                )
+            else:
+                response = self.transport.send_request(request, timeout)
             logger.debug('Response: %s', response)
             return response
 
-        except HTTPError as e:
+        except _module.HTTPError as e:
             if e.code == 400:
                 raise ClientMissingParams(str(e))
             elif e.code == 401:
                 raise ClientSignatureError(str(e))
             else:
                 raise ClientBadUrl(str(e))
-        except URLError as e:
+        except _module.URLError as e:
             raise ClientBadHost(str(e))
@@ -0,0 +1,115 @@
+from __future__ import division, unicode_literals
+
+import itertools
+import threading
+from collections import deque
+
+
+def nearest_rank(ordered, percentile):
+    """
+    Computes a percentile of sorted samples, using the nearest-rank method.
+
+    :param ordered: The samples, sorted in ascending order. Must not be empty.
+    :param percentile: The percentile to compute, between 0 and 100.
+    """
+    rank = int(round(percentile / 100 * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class LatencyTracker(object):
+
+    def __init__(self, window=200, min_samples=20, factor=2.0, minimum=0.05,
+                 max_keys=1000):
+        """
+        Keeps a sliding window of observed latencies per procedure (or topic)
+        and derives adaptive timeouts from them.
+
+        :param window: Number of most recent samples kept for every key.
+        :param min_samples: Number of samples required before any percentile
+        is reported for a key. Until then, the key is considered unknown.
+        :param factor: Multiplier applied to the p99 latency when computing an
+        adaptive timeout.
+        :param minimum: Lower bound in seconds for adaptive timeouts, so a very
+        fast procedure does not end up with an unreasonably tight timeout.
+        :param max_keys: Maximum number of keys kept. Beyond that, the samples
+        of the least recently recorded key are forgotten.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.factor = factor
+        self.minimum = minimum
+        self.max_keys = max_keys
+        self._samples = {}
+        # When every key was last recorded, to forget the least recent first.
+        # ``OrderedDict`` is not available on Python 2.6.
+        self._recorded = {}
+        self._clock = itertools.count()
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        """
+        Records a latency sample.
+
+        :param key: The procedure or topic the sample belongs to.
+        :param seconds: The observed latency, in seconds.
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                while self._samples and len(self._samples) >= self.max_keys:
+                    oldest = min(self._recorded, key=self._recorded.get)
+                    del self._samples[oldest]
+                    del self._recorded[oldest]
+                samples = self._samples[key] = deque(maxlen=self.window)
+            self._recorded[key] = next(self._clock)
+            samples.append(seconds)
+
+    def percentile(self, key, percentile):
+        """
+        Computes a latency percentile for the given key, using the
+        nearest-rank method.
+
+        :param key: The procedure or topic.
+        :param percentile: The percentile to compute, between 0 and 100.
+        :return: The latency in seconds, or ``None`` if there are not enough
+        samples for the key yet.
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+
+        return nearest_rank(ordered, percentile)
+
+    def timeout_for(self, key, default=None):
+        """
+        Derives an adaptive timeout from the observed p99 latency of a key.
+
+        :param key: The procedure or topic.
+        :param default: The static timeout configured in the ``Client``. It is
+        returned as is while the key has too few samples, and it caps the
+        adaptive timeout otherwise.
+        :return: The timeout in seconds.
+        """
+        p99 = self.percentile(key, 99)
+        if p99 is None:
+            return default
+
+        timeout = max(self.minimum, p99 * self.factor)
+        if default is not None:
+            timeout = min(timeout, default)
+
+        return timeout
+
+    def reset(self, key=None):
+        """
+        Forgets the samples of a key, or of every key if none is given.
+        """
+        with self._lock:
+            if key is None:
+                self._samples.clear()
+                self._recorded.clear()
+            else:
+                self._samples.pop(key, None)
+                self._recorded.pop(key, None)
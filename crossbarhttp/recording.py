@@ -0,0 +1,146 @@
+from __future__ import unicode_literals
+
+import io
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from .compat import monotonic
+
+logger = logging.getLogger('crossbarhttp')
+
+# Version of the capture file format.
+CAPTURE_VERSION = 1
+
+# A request read from a capture file. ``offset`` is the number of seconds
+# since the recording started, and ``size`` the size of the JSON body in
+# bytes, or ``None`` if unknown, like when the request failed before.
+CapturedRequest = namedtuple(
+    'CapturedRequest', 'offset method name size outcome latency'
+)
+
+# Compact names of the methods in capture files.
+METHODS = {'publish': 'p', 'call': 'c'}
+
+
+def _open(path_or_file, mode):
+    """
+    Opens a capture file in binary mode, compressed if its name ends with
+    ``.gz``. File objects are returned as they are.
+    """
+    if not hasattr(path_or_file, 'startswith'):
+        return path_or_file, False
+    if path_or_file.endswith('.gz'):
+        import gzip
+        return gzip.open(path_or_file, mode), True
+    return io.open(path_or_file, mode), True
+
+
+class Recorder(object):
+
+    def __init__(self, path_or_file):
+        """
+        Records the publishes and calls of one or more clients to a capture
+        file, to play them back later with a ``Replayer``.
+
+        Capture files are JSON lines: a header object, then one array per
+        request, holding when it was sent, its method, topic or procedure,
+        payload size, outcome and latency. Payloads are not recorded.
+
+        :param path_or_file: The path of the capture file, which is
+        compressed if it ends with ``.gz``, or a file object open for writing
+        in binary mode.
+        """
+        self._file, self._owned = _open(path_or_file, 'wb')
+        self._origin = monotonic()
+        self._lock = threading.Lock()
+        self.count = 0
+
+        self._write({'version': CAPTURE_VERSION, 'started': time.time()})
+
+    def _write(self, value):
+        line = json.dumps(value, separators=(',', ':')) + '\n'
+        self._file.write(line.encode('utf-8'))
+
+    def record(self, method, name, size, outcome, latency, started):
+        """
+        Records a request. Failures to record it are logged, never raised, so
+        recording does not break the requests.
+
+        :param method: ``'publish'`` or ``'call'``.
+        :param name: The topic or procedure.
+        :param size: The size of the request body in bytes, or ``None`` if
+        unknown.
+        :param outcome: ``'ok'``, the WAMP error URI or the name of the
+        exception raised.
+        :param latency: The latency of the request, in seconds.
+        :param started: The ``monotonic`` time the request was sent at.
+        """
+        try:
+            entry = [
+                round(started - self._origin, 6), METHODS[method], name, size,
+                outcome, round(latency, 6)
+            ]
+            with self._lock:
+                self._write(entry)
+                self.count += 1
+        except Exception as e:
+            logger.warning("Couldn't record %s to %r: %s", method, name, e)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        """
+        Flushes the capture file, and closes it if it was opened from a path.
+        """
+        with self._lock:
+            if self._owned:
+                self._file.close()
+            else:
+                self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_capture(path_or_file):
+    """
+    Reads the requests of a capture file written by a ``Recorder``.
+
+    :param path_or_file: The path of the capture file, or a file object open
+    for reading in binary mode.
+    :return: A generator of ``CapturedRequest``.
+    :raise ValueError: If the file is not a capture, or its version is not
+    supported.
+    """
+    methods = dict((value, key) for key, value in METHODS.items())
+    capture, owned = _open(path_or_file, 'rb')
+
+    try:
+        header = json.loads(capture.readline().decode('utf-8') or 'null')
+        if not isinstance(header, dict) or 'version' not in header:
+            raise ValueError('Not a capture file')
+        if header['version'] > CAPTURE_VERSION:
+            raise ValueError(
+                'Unsupported capture version {0}'.format(header['version'])
+            )
+
+        for line in capture:
+            if not line.strip():
+                continue
+            offset, method, name, size, outcome, latency = json.loads(
+                line.decode('utf-8')
+            )
+            yield CapturedRequest(
+                offset, methods[method], name, size, outcome, latency
+            )
+    finally:
+        if owned:
+            capture.close()
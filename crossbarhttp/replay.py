@@ -0,0 +1,283 @@
+"""
+Plays back a capture file, recorded by a ``Recorder``, against a HTTP bridge::
+
+    python -m crossbarhttp.replay capture.jsonl.gz \\
+        --publish-url http://127.0.0.1:8080/publish \\
+        --call-url http://127.0.0.1:8080/call \\
+        --speed 2 --concurrency 16
+"""
+from __future__ import division, print_function, unicode_literals
+
+import json
+import threading
+
+from .compat import monotonic
+from .cooperative import get_backend
+from .crossbarhttp import Client
+from .latency import nearest_rank
+from .recording import read_capture
+
+# Percentiles of the latency reported.
+PERCENTILES = (50, 90, 99)
+
+
+def make_payload(method, name, size):
+    """
+    Creates the arguments of a replayed request, so its JSON body is about
+    ``size`` bytes like the recorded one.
+
+    :return: A tuple of arguments.
+    """
+    if not size:
+        return ()
+
+    key = 'topic' if method == 'publish' else 'procedure'
+    empty = json.dumps({key: name, 'args': [''], 'kwargs': {}})
+    return ('x' * max(0, size - len(empty.encode('utf-8'))),)
+
+
+class _Results(object):
+    """
+    Collects the outcome of the replayed requests, standing as the recorder
+    of the replaying clients.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, name, size, outcome, latency, started):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+
+class ReplayReport(object):
+
+    def __init__(self, captured, results, duration, lags, skipped):
+        """
+        Outcome of a replay.
+
+        :param captured: The latencies of the recorded requests, in seconds.
+        :param results: The ``_Results`` of the replayed requests.
+        :param duration: Seconds the replay took.
+        :param lags: Seconds every request was sent later than scheduled.
+        :param skipped: Number of requests not replayed, for lack of URL.
+        """
+        self.requests = len(results.latencies)
+        self.duration = duration
+        self.throughput = self.requests / duration if duration else 0.0
+        self.outcomes = results.outcomes
+        self.skipped = skipped
+        self.latency = self._percentiles(results.latencies)
+        self.recorded_latency = self._percentiles(captured)
+        self.lag = self._percentiles(lags)
+
+    @staticmethod
+    def _percentiles(samples):
+        """
+        :return: A dict of the latency percentiles, and ``'max'``, in seconds.
+        Empty if there are no samples.
+        """
+        if not samples:
+            return {}
+
+        ordered = sorted(samples)
+        values = dict(
+            (percentile, nearest_rank(ordered, percentile))
+            for percentile in PERCENTILES
+        )
+        values['max'] = ordered[-1]
+        return values
+
+    def __str__(self):
+        lines = [
+            'Requests:   {0} in {1:.2f}s ({2} skipped)'.format(
+                self.requests, self.duration, self.skipped
+            ),
+            'Throughput: {0:.1f} requests/s'.format(self.throughput),
+            '',
+            '{0:<12}{1:>12}{2:>12}{3:>12}'.format(
+                'Latency', 'replayed', 'recorded', 'send lag'
+            ),
+        ]
+        for percentile in PERCENTILES + ('max',):
+            name = 'max' if percentile == 'max' else 'p{0}'.format(percentile)
+            columns = [name]
+            for values in (self.latency, self.recorded_latency, self.lag):
+                value = values.get(percentile)
+                columns.append(
+                    '-' if value is None else '{0:.2f}ms'.format(value * 1000)
+                )
+            lines.append('{0:<12}{1:>12}{2:>12}{3:>12}'.format(*columns))
+
+        lines.append('')
+        lines.append('Outcomes:')
+        for outcome, count in sorted(self.outcomes.items()):
+            lines.append('  {0:<40}{1:>8}'.format(outcome, count))
+
+        return '\n'.join(lines)
+
+
+class Replayer(object):
+
+    def __init__(self, capture, publish_url=None, call_url=None, speed=1.0,
+                 concurrency=8, **client_options):
+        """
+        Plays back the requests of a capture file against a HTTP bridge,
+        keeping their recorded timing, to test how it copes with the recorded
+        traffic, or with a multiple of it.
+
+        Payloads are not recorded, so every request is replayed with a
+        payload of the recorded size.
+
+        :param capture: The path of the capture file, or a file object open
+        for reading in binary mode.
+        :param publish_url: The URL of the publisher service the publishes are
+        sent to. If not given, they are skipped.
+        :param call_url: The URL of the caller service the calls are sent to.
+        If not given, they are skipped.
+        :param speed: How many times faster than recorded the requests are
+        sent. ``None`` or ``0`` send them as fast as possible.
+        :param concurrency: Maximum number of requests in flight.
+        :param client_options: Options of the ``Client`` instances sending the
+        requests, like ``key``, ``secret`` or ``timeout``.
+        """
+        self.capture = capture
+        self.speed = speed
+        self.concurrency = concurrency
+        self.backend = get_backend(client_options.get('cooperative', False))
+        self._results = _Results()
+
+        client_options['recorder'] = self._results
+        self.clients = {}
+        if publish_url is not None:
+            self.clients['publish'] = Client(publish_url, **client_options)
+        if call_url is not None:
+            self.clients['call'] = Client(call_url, **client_options)
+
+    def run(self):
+        """
+        Plays back the capture, and waits for the last response.
+
+        :return: A ``ReplayReport``.
+        """
+        queue = self.backend.Queue()
+        done = self.backend.Queue()
+        lags = []
+
+        for _ in range(self.concurrency):
+            self.backend.spawn(self._worker, queue, done, lags)
+
+        captured = []
+        skipped = 0
+        first = None
+        started = monotonic()
+        for request in read_capture(self.capture):
+            if request.method not in self.clients:
+                skipped += 1
+                continue
+            captured.append(request.latency)
+
+            if first is None:
+                first = request.offset
+            if self.speed:
+                due = started + (request.offset - first) / self.speed
+                delay = due - monotonic()
+                if delay > 0:
+                    self.backend.sleep(delay)
+            else:
+                due = monotonic()
+            queue.put((request, due))
+
+        for _ in range(self.concurrency):
+            queue.put(None)
+        for _ in range(self.concurrency):
+            done.get()
+
+        return ReplayReport(
+            captured, self._results, monotonic() - started, lags, skipped
+        )
+
+    def close(self):
+        """
+        Closes the clients sending the requests, and their connections.
+        """
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _worker(self, queue, done, lags):
+        """
+        Sends the queued requests until told to stop.
+        """
+        try:
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                request, due = item
+                lags.append(max(0.0, monotonic() - due))
+
+                client = self.clients[request.method]
+                method = getattr(client, request.method)
+                try:
+                    method(request.name, *make_payload(
+                        request.method, request.name, request.size
+                    ))
+                except Exception:
+                    # Already recorded as the outcome of the request.
+                    pass
+        finally:
+            done.put(None)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('capture', help='Path of the capture file')
+    parser.add_argument('--publish-url', help='URL to send the publishes to')
+    parser.add_argument('--call-url', help='URL to send the calls to')
+    parser.add_argument(
+        '--speed', type=float, default=1.0,
+        help='Times faster than recorded. 0 sends as fast as possible'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=8,
+        help='Maximum number of requests in flight'
+    )
+    parser.add_argument('--key', help='Key of signed requests')
+    parser.add_argument('--secret', help='Secret of signed requests')
+    parser.add_argument(
+        '--timeout', type=float, default=10,
+        help='Timeout of every request, in seconds'
+    )
+    options = parser.parse_args(argv)
+
+    if options.publish_url is None and options.call_url is None:
+        parser.error('at least one of --publish-url or --call-url is needed')
+
+    with Replayer(
+        options.capture,
+        publish_url=options.publish_url,
+        call_url=options.call_url,
+        speed=options.speed,
+        concurrency=options.concurrency,
+        key=options.key,
+        secret=options.secret,
+        timeout=options.timeout,
+        # Pooled connections, like long-running producers have.
+        warmup=options.concurrency
+    ) as replayer:
+        print(replayer.run())
+
+
+if __name__ == '__main__':
+    main()
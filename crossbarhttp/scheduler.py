@@ -0,0 +1,350 @@
+from __future__ import unicode_literals
+
+import logging
+from collections import deque
+
+from .crossbarhttp import ClientQueueFull
+
+logger = logging.getLogger('crossbarhttp')
+
+
+class ScheduledRequest(object):
+    """
+    Handle of a request queued in a ``Scheduler``.
+    """
+
+    def __init__(self, lane, method, name, args, kwargs, backend):
+        self.lane = lane
+        self.method = method
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self._done = backend.Event()
+        self._value = None
+        self._error = None
+
+    def done(self):
+        """
+        Tells whether the request has been sent and answered.
+        """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the request to be sent and answered.
+
+        :param timeout: Maximum seconds to wait. Waits forever by default.
+        :return: Whether the request is done.
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def result(self):
+        """
+        Waits for the request and returns what ``publish`` or ``call``
+        returned, or raises what they raised.
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class Lane(object):
+
+    def __init__(self, scheduler, name, max_size):
+        """
+        Priority class of a ``Scheduler``. Requests are queued per topic (or
+        procedure), and the topics take turns in proportion to their weights
+        (deficit round-robin), so a burst on a noisy topic does not delay the
+        other topics of the lane.
+
+        :param scheduler: The scheduler the lane belongs to.
+        :param name: The name of the lane.
+        :param max_size: Maximum number of requests queued in the lane.
+        """
+        self.scheduler = scheduler
+        self.name = name
+        self.max_size = max_size
+        self.size = 0
+        self._queues = {}
+        self._deficits = {}
+        self._active = deque()
+
+    def publish(self, topic, *args, **kwargs):
+        """
+        Queues a publish in this lane.
+
+        :return: A ``ScheduledRequest``.
+        """
+        return self.scheduler.submit(self.name, 'publish', topic, args, kwargs)
+
+    def call(self, procedure, *args, **kwargs):
+        """
+        Queues a call in this lane.
+
+        :return: A ``ScheduledRequest``.
+        """
+        return self.scheduler.submit(
+            self.name, 'call', procedure, args, kwargs
+        )
+
+    def push(self, request):
+        """
+        Queues a request. Must be called holding the scheduler lock.
+        """
+        if self.size >= self.max_size:
+            raise ClientQueueFull(
+                'Lane {0!r} is full ({1} requests)'.format(
+                    self.name, self.max_size
+                )
+            )
+
+        queue = self._queues.get(request.name)
+        if queue is None:
+            queue = self._queues[request.name] = deque()
+            self._deficits[request.name] = 0
+            self._active.append(request.name)
+        queue.append(request)
+        self.size += 1
+
+    def pop(self):
+        """
+        Takes the next request in weighted fair order. Must be called holding
+        the scheduler lock.
+
+        :return: A ``ScheduledRequest``, or ``None`` if the lane is empty.
+        """
+        while self._active:
+            name = self._active[0]
+            if self._deficits[name] < 1:
+                self._deficits[name] += self.scheduler.weights.get(name, 1)
+                if self._deficits[name] < 1:
+                    self._active.rotate(-1)
+                    continue
+
+            queue = self._queues[name]
+            request = queue.popleft()
+            self._deficits[name] -= 1
+            self.size -= 1
+
+            if not queue:
+                # Idle topics do not keep their credit.
+                self._active.popleft()
+                del self._queues[name]
+                del self._deficits[name]
+            elif self._deficits[name] < 1:
+                self._active.rotate(-1)
+
+            return request
+
+        return None
+
+
+class Scheduler(object):
+
+    def __init__(self, client, lanes=('high', 'normal', 'low'),
+                 default_lane=None, routes=None, weights=None, max_size=1000,
+                 workers=4, reserved_workers=1):
+        """
+        Queues publishes and calls in front of a ``Client``, and sends them in
+        the background by priority.
+
+        Lanes are served in strict priority order. Within a lane, topics (or
+        procedures) are served by weighted fair queuing. ``reserved_workers``
+        of the ``workers`` only ever serve the first lane, so its requests are
+        never blocked by the lower lanes, even when those are saturated.
+
+        :param client: The ``Client`` sending the requests.
+        :param lanes: Names of the lanes, from highest to lowest priority.
+        :param default_lane: The lane of requests without route. Defaults to
+        the middle one.
+        :param routes: Mapping of topics or procedures to lane names, or a
+        function returning the lane name for a topic or procedure (or
+        ``None`` for the default lane).
+        :param weights: Mapping of topics or procedures to their share within
+        their lane, as positive numbers. Defaults to 1 for all of them.
+        :param max_size: Maximum number of requests queued per lane, or a
+        mapping of lane names to it.
+        :param workers: Maximum number of requests in flight.
+        :param reserved_workers: How many of the ``workers`` are reserved for
+        the first lane.
+        :raise ValueError: If a weight is not positive.
+        """
+        assert 0 <= reserved_workers < workers
+
+        for name, weight in (weights or {}).items():
+            if not weight > 0:
+                raise ValueError(
+                    'Weight of {0!r} must be positive, got {1!r}'.format(
+                        name, weight
+                    )
+                )
+
+        self.client = client
+        self.backend = client.backend
+        self.workers = workers
+        self.reserved_workers = reserved_workers
+        self.routes = routes or {}
+        self.weights = weights or {}
+
+        if not isinstance(max_size, dict):
+            max_size = dict((name, max_size) for name in lanes)
+        self.lanes = [Lane(self, name, max_size[name]) for name in lanes]
+        self._lanes = dict((lane.name, lane) for lane in self.lanes)
+        self.default_lane = default_lane or lanes[len(lanes) // 2]
+
+        self.in_flight = 0
+        self.closed = False
+        self._lock = self.backend.Lock()
+        self._wakeups = self.backend.Queue()
+        self._stopped = self.backend.Event()
+        self.backend.spawn(self._dispatch)
+
+    def __getitem__(self, name):
+        """
+        Gets a lane by name, like ``scheduler['high'].publish(...)``.
+        """
+        return self._lanes[name]
+
+    def lane_for(self, name):
+        """
+        Routes a topic or procedure to its lane name.
+        """
+        if callable(self.routes):
+            lane = self.routes(name)
+        else:
+            lane = self.routes.get(name)
+        return lane or self.default_lane
+
+    def publish(self, topic, *args, **kwargs):
+        """
+        Queues a publish in the lane its topic is routed to.
+
+        :return: A ``ScheduledRequest``.
+        """
+        return self.submit(
+            self.lane_for(topic), 'publish', topic, args, kwargs
+        )
+
+    def call(self, procedure, *args, **kwargs):
+        """
+        Queues a call in the lane its procedure is routed to.
+
+        :return: A ``ScheduledRequest``.
+        """
+        return self.submit(
+            self.lane_for(procedure), 'call', procedure, args, kwargs
+        )
+
+    def submit(self, lane, method, name, args, kwargs):
+        """
+        Queues a request.
+
+        :param lane: The name of the lane.
+        :param method: ``'publish'`` or ``'call'``.
+        :param name: The topic or procedure.
+        :param args: The arguments.
+        :param kwargs: The key/word arguments.
+        :return: A ``ScheduledRequest``.
+        :raise ClientQueueFull: If the lane is full or the scheduler closed.
+        :raise ValueError: If there is no such lane, like when a route names
+        an unknown one.
+        """
+        if lane not in self._lanes:
+            raise ValueError(
+                'No lane {0!r} for {1!r}, the lanes are: {2}'.format(
+                    lane, name, ', '.join(other.name for other in self.lanes)
+                )
+            )
+
+        request = ScheduledRequest(
+            lane, method, name, args, kwargs, self.backend
+        )
+        with self._lock:
+            if self.closed:
+                raise ClientQueueFull('Scheduler is closed')
+            self._lanes[lane].push(request)
+
+        self._wakeups.put(None)
+        return request
+
+    def close(self, wait=True, timeout=None):
+        """
+        Stops accepting requests. The queued ones are still sent.
+
+        :param wait: Whether to wait until all of them are done.
+        :param timeout: Maximum seconds to wait.
+        :return: Whether all the requests are done.
+        """
+        with self._lock:
+            self.closed = True
+        self._wakeups.put(None)
+
+        if wait:
+            self._stopped.wait(timeout)
+        return self._stopped.is_set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _take(self):
+        """
+        Takes the next request to send, if a worker is free for it. Must be
+        called holding the lock.
+        """
+        for index, lane in enumerate(self.lanes):
+            limit = self.workers
+            if index > 0:
+                limit -= self.reserved_workers
+            if self.in_flight >= limit:
+                continue
+
+            request = lane.pop()
+            if request is not None:
+                return request
+
+        return None
+
+    def _dispatch(self):
+        """
+        Sends the queued requests as workers get free, until closed and
+        drained.
+        """
+        while True:
+            self._wakeups.get()
+            with self._lock:
+                while True:
+                    request = self._take()
+                    if request is None:
+                        break
+                    self.in_flight += 1
+                    self.backend.spawn(self._send, request)
+
+                queued = sum(lane.size for lane in self.lanes)
+                if self.closed and not queued and not self.in_flight:
+                    break
+
+        self._stopped.set()
+
+    def _send(self, request):
+        """
+        Sends a request through the client and records its outcome.
+        """
+        try:
+            method = getattr(self.client, request.method)
+            request._value = method(
+                request.name, *request.args, **request.kwargs
+            )
+        except Exception as e:
+            logger.debug('Scheduled %s to %r failed: %r', request.method,
+                         request.name, e)
+            request._error = e
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            request._done.set()
+            self._wakeups.put(None)
@@ -0,0 +1,164 @@
+from __future__ import unicode_literals
+
+from .compat import Iterator
+
+# Size of the chunks the request body is sent in, in bytes.
+CHUNK_SIZE = 64 * 1024
+
+# Signed bodies are spooled to disk once they are larger than this, in bytes.
+SPOOL_SIZE = 1024 * 1024
+
+
+def is_streamed(json_params):
+    """
+    Tells whether the request parameters must be streamed, which happens when
+    any of the ``args`` or ``kwargs`` passed to ``publish`` or ``call`` is, or
+    contains at any depth, an iterator, like a generator.
+
+    :param json_params: The parameters intended to be JSON serialized.
+    """
+    if not isinstance(json_params, dict):
+        return False
+
+    return (_contains_iterator(json_params.get('args') or ()) or
+            _contains_iterator(json_params.get('kwargs') or {}))
+
+
+def _contains_iterator(value):
+    """
+    Tells whether a value is, or a dict, list or tuple contains at any depth,
+    an iterator.
+    """
+    if isinstance(value, Iterator):
+        return True
+    if isinstance(value, dict):
+        return any(_contains_iterator(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_contains_iterator(item) for item in value)
+    return False
+
+
+def _json_key(key):
+    """
+    JSON-encodes a dict key the way ``json.dumps`` does: numbers, booleans and
+    ``None`` are turned into text first, since JSON keys must be strings.
+    """
+    import json
+    import numbers
+
+    if isinstance(key, (str, type(''))):
+        return json.dumps(key)
+    if key is None or isinstance(key, numbers.Real):
+        return json.dumps(json.dumps(key))
+    raise TypeError(
+        'keys must be str, int, float, bool or None, not {0}'.format(
+            type(key).__name__
+        )
+    )
+
+
+def iter_json(value):
+    """
+    JSON-encodes a value incrementally. Iterators are encoded as JSON arrays,
+    one item at a time, so they are never held in memory as a whole. Values
+    without iterators are encoded at once by ``json.dumps``.
+
+    :param value: The value to encode.
+    :return: A generator of JSON text pieces.
+    """
+    import json
+
+    if isinstance(value, dict) and _contains_iterator(value):
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                yield ', '
+            yield _json_key(key)
+            yield ': '
+            for piece in iter_json(item):
+                yield piece
+        yield '}'
+    elif isinstance(value, (Iterator, list, tuple)) and (
+            _contains_iterator(value)):
+        yield '['
+        for index, item in enumerate(value):
+            if index:
+                yield ', '
+            for piece in iter_json(item):
+                yield piece
+        yield ']'
+    else:
+        yield json.dumps(value)
+
+
+def iter_chunks(pieces, size=CHUNK_SIZE):
+    """
+    Encodes text pieces to UTF-8 and groups them in chunks of about ``size``
+    bytes, so they are not sent in lots of tiny chunks.
+
+    :param pieces: An iterable of text.
+    :param size: The chunk size, in bytes.
+    :return: A generator of ``bytes`` chunks.
+    """
+    buffered = []
+    length = 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffered.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffered)
+            buffered = []
+            length = 0
+
+    if buffered:
+        yield b''.join(buffered)
+
+
+def count_bytes(chunks, request_info):
+    """
+    Adds up the size of the chunks to ``request_info['size']`` as they are
+    consumed.
+
+    :return: A generator of the same chunks.
+    """
+    for chunk in chunks:
+        request_info['size'] += len(chunk)
+        yield chunk
+
+
+def spool(chunks, spool_file):
+    """
+    Writes the chunks to ``spool_file`` as they are consumed.
+
+    :return: A generator of the same chunks.
+    """
+    for chunk in chunks:
+        spool_file.write(chunk)
+        yield chunk
+
+
+def replay(spool_file, size=CHUNK_SIZE):
+    """
+    Reads back a spooled body in chunks, and closes the file when done.
+
+    :return: A generator of ``bytes`` chunks.
+    """
+    try:
+        spool_file.seek(0)
+        while True:
+            chunk = spool_file.read(size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool_file.close()
+
+
+def spooled_file():
+    """
+    Creates the file a signed body is spooled to while its signature is being
+    computed. It is kept in memory until it grows larger than ``SPOOL_SIZE``.
+    """
+    import tempfile
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
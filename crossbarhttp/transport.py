@@ -0,0 +1,589 @@
+from __future__ import unicode_literals
+
+import errno
+import io
+import json
+import logging
+import socket
+
+from .compat import (
+    BadStatusLine, HTTPConnection, HTTPError, monotonic, TLS_SESSIONS,
+    URLError, urlparse
+)
+from .cooperative import get_backend
+
+logger = logging.getLogger('crossbarhttp')
+
+
+class DNSCache(object):
+
+    def __init__(self, ttl=60, backend=None):
+        """
+        Caches the resolved addresses of the Crossbar.io nodes, so the host
+        name is not resolved again for every new connection.
+
+        :param ttl: Seconds the resolved addresses are kept.
+        :param backend: The concurrency backend. Defaults to threads.
+        """
+        self.ttl = ttl
+        self.backend = backend or get_backend()
+        self._entries = {}
+        self._lock = self.backend.Lock()
+
+    def resolve(self, host, port):
+        """
+        Resolves a host name, or returns its cached addresses.
+
+        :return: A list of ``socket.getaddrinfo`` tuples.
+        """
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        addresses = self.backend.socket.getaddrinfo(
+            host, port, 0, socket.SOCK_STREAM
+        )
+        with self._lock:
+            self._entries[(host, port)] = (now + self.ttl, addresses)
+
+        return addresses
+
+    def invalidate(self, host, port):
+        """
+        Forgets the cached addresses of a host, like when none of them could
+        be connected to.
+        """
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TCPHTTPConnection(HTTPConnection):
+    """
+    HTTP connection over TCP, opening its socket through the concurrency
+    backend, and wrapping it with TLS if given a SSL context.
+
+    Given a ``tls_sessions`` mapping, the TLS session of the host is resumed
+    from it when connecting, and saved back to it, so the connections to the
+    same host after the first one skip the full handshake.
+    """
+
+    def __init__(self, host, port=None, timeout=None, backend=None,
+                 ssl_context=None, dns_cache=None, tls_sessions=None):
+        HTTPConnection.__init__(self, host, port)
+        self.timeout = timeout
+        self.backend = backend or get_backend()
+        self.ssl_context = ssl_context
+        self.dns_cache = dns_cache
+        self.tls_sessions = tls_sessions
+
+    def _open_socket(self):
+        """
+        Connects to the first reachable address of the host, like
+        ``socket.create_connection`` does, but taking them from the DNS cache.
+        """
+        if self.dns_cache is None:
+            return self.backend.socket.create_connection(
+                (self.host, self.port), self.timeout
+            )
+
+        error = None
+        for family, type_, proto, _, address in self.dns_cache.resolve(
+                self.host, self.port):
+            sock = self.backend.socket.socket(family, type_, proto)
+            try:
+                sock.settimeout(self.timeout)
+                sock.connect(address)
+                return sock
+            except socket.error as e:
+                sock.close()
+                error = e
+
+        # The node may have moved to other addresses.
+        self.dns_cache.invalidate(self.host, self.port)
+        raise error or socket.error('getaddrinfo returned no addresses')
+
+    def connect(self):
+        sock = self._open_socket()
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.ssl_context is not None:
+                session = None
+                if self.tls_sessions is not None and TLS_SESSIONS:
+                    session = self.tls_sessions.get((self.host, self.port))
+                sock = self.backend.wrap_socket(
+                    self.ssl_context, sock, self.host, session
+                )
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def save_session(self):
+        """
+        Saves the TLS session of the connection, to be resumed by the next
+        connections to the same host.
+
+        With TLS 1.3, the session ticket is only received after the
+        handshake, so it must be called once a response has been read.
+        """
+        if self.tls_sessions is None or self.sock is None:
+            return
+
+        session = getattr(self.sock, 'session', None)
+        if session is None:
+            return
+
+        # A TLS 1.3 session without ticket yet can not be resumed, so it does
+        # not replace a resumable one.
+        key = (self.host, self.port)
+        resumable = getattr(session, 'has_ticket', True)
+        if resumable or key not in self.tls_sessions:
+            self.tls_sessions[key] = session
+
+    def close(self):
+        self.save_session()
+        HTTPConnection.close(self)
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    HTTP connection over a Unix domain socket.
+    """
+
+    def __init__(self, path, timeout=None, backend=None):
+        HTTPConnection.__init__(self, 'localhost')
+        self.path = path
+        self.timeout = timeout
+        self.backend = backend or get_backend()
+
+    def connect(self):
+        sock = self.backend.socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except socket.error:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class Cancellation(object):
+
+    def __init__(self, backend=None):
+        """
+        Cancels a request sent by an ``HTTPTransport``, like the duplicate of
+        a hedged call once another one answered. A request not sent yet is
+        not sent at all, and one in flight has its connection shut down, so
+        it stops waiting for the response.
+
+        :param backend: The concurrency backend. Defaults to threads.
+        """
+        self.cancelled = False
+        self._connection = None
+        self._lock = (backend or get_backend()).Lock()
+
+    def attach(self, connection):
+        """
+        Tracks the connection the request is sent over.
+
+        :return: ``False`` if the request was cancelled already.
+        """
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._connection = connection
+            return True
+
+    def detach(self):
+        """
+        Stops tracking the connection of the request, once it got its
+        response, so the connection can go back to the pool.
+
+        :return: ``False`` if the request was cancelled already, in which
+        case its connection may have been shut down.
+        """
+        with self._lock:
+            self._connection = None
+            return not self.cancelled
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            connection, self._connection = self._connection, None
+
+        sock = connection.sock if connection is not None else None
+        if sock is not None:
+            try:
+                # Unlike closing it, shutting the socket down wakes up the
+                # thread or greenlet waiting on it.
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class HTTPTransport(object):
+
+    def __init__(self, pool_size=4, backend=None):
+        """
+        Base class for transports sending the requests over a pool of
+        persistent HTTP connections, instead of opening a new one through
+        ``urlopen`` for every request.
+
+        Idle connections are pooled per origin. Subclasses must implement
+        ``_new_connection``, and may override ``_origin``.
+
+        :param pool_size: Maximum number of idle connections kept open for
+        every origin.
+        :param backend: The concurrency backend, from
+        ``crossbarhttp.cooperative.get_backend``. Defaults to threads.
+        """
+        self.pool_size = pool_size
+        self.backend = backend or get_backend()
+        self._idle = {}
+        self._lock = self.backend.Lock()
+
+    def cancellation(self):
+        """
+        :return: A ``Cancellation`` to pass to ``send_request``.
+        """
+        return Cancellation(self.backend)
+
+    def _origin(self, parsed):
+        """
+        Tells which pool the connections for a URL belong to.
+
+        :param parsed: The parsed URL of the request.
+        :return: A ``(scheme, host, port)`` tuple.
+        """
+        return parsed.scheme, parsed.hostname, parsed.port
+
+    def _new_connection(self, origin, timeout):
+        """
+        Creates a new, not yet connected, ``HTTPConnection``.
+
+        :param origin: The ``(scheme, host, port)`` tuple to connect to.
+        :param timeout: The timeout in seconds for the connection.
+        """
+        raise NotImplementedError
+
+    def _acquire(self, origin, timeout, reuse=True):
+        """
+        Takes an idle connection from the pool, or creates a new one.
+
+        :param reuse: Whether an idle connection may be taken. If not, a new
+        connection is always created.
+        :return: A ``(connection, reused)`` tuple.
+        """
+        connection = None
+        while reuse:
+            with self._lock:
+                idle = self._idle.get(origin)
+                connection = idle.pop() if idle else None
+            if connection is None or not self._is_dropped(connection):
+                break
+            logger.debug('Discarding idle connection closed by the server')
+            connection.close()
+            connection = None
+
+        if connection is None:
+            return self._new_connection(origin, timeout), False
+
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+        return connection, True
+
+    def _is_dropped(self, connection):
+        """
+        Tells whether the server closed an idle connection, like urllib3
+        does: an idle connection must not be readable, unless only TLS
+        messages, like session tickets, are pending.
+        """
+        import select
+
+        sock = connection.sock
+        if sock is None:
+            return False
+
+        try:
+            if hasattr(select, 'poll'):
+                # Unlike ``select``, ``poll`` is not limited to file
+                # descriptors below ``FD_SETSIZE``, usually 1024.
+                poller = select.poll()
+                poller.register(sock, select.POLLIN)
+                readable = poller.poll(0)
+            else:
+                readable = select.select([sock], [], [], 0)[0]
+        except (ValueError, select.error, socket.error):
+            return True
+        if not readable:
+            return False
+
+        # Either the end of the stream, or data the server should not have
+        # sent, which would be taken for the next response.
+        timeout = sock.gettimeout()
+        try:
+            sock.settimeout(0)
+            sock.recv(1)
+            return True
+        except self.backend.ssl.SSLWantReadError:
+            return False
+        except socket.error as e:
+            return e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK)
+        finally:
+            try:
+                sock.settimeout(timeout)
+            except socket.error:
+                pass
+
+    def _release(self, origin, connection):
+        """
+        Puts a connection back in the pool, or closes it if the pool is full.
+        """
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def warmup(self, url, connections=1, timeout=None):
+        """
+        Opens connections to the node of a URL and puts them in the pool, so
+        the first requests do not pay the connection setup.
+
+        At most ``pool_size`` connections are kept.
+
+        :param url: The URL of the node.
+        :param connections: Number of connections to open.
+        :param timeout: The timeout in seconds for every connection.
+        :return: The number of connections opened.
+        """
+        origin = self._origin(urlparse(url))
+        opened = []
+        try:
+            for _ in range(connections):
+                connection = self._new_connection(origin, timeout)
+                try:
+                    connection.connect()
+                except socket.error as e:
+                    connection.close()
+                    raise URLError(e)
+                opened.append(connection)
+        finally:
+            for connection in opened:
+                self._release(origin, connection)
+
+        return len(opened)
+
+    def close(self):
+        """
+        Closes all the idle connections.
+        """
+        with self._lock:
+            pools, self._idle = self._idle, {}
+
+        for idle in pools.values():
+            for connection in idle:
+                connection.close()
+
+    def send_request(self, request, timeout, cancellation=None):
+        """
+        Performs a request to the Crossbar.io node over a pooled connection.
+
+        :param request: The ``urllib.request.Request`` object to be sent.
+        :param timeout: The timeout in seconds, passed from the ``Client``.
+        :param cancellation: A ``Cancellation`` to cancel the request with.
+        :return: The response data in a JSON payload.
+        :raise URLError: If the request is cancelled.
+        """
+        url = request.get_full_url()
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path = '{0}?{1}'.format(path, parsed.query)
+
+        origin = self._origin(parsed)
+        method = request.get_method()
+        headers = dict(request.header_items())
+
+        # A streamed body can only be sent once, so it is not sent over an
+        # idle connection the server may have closed in the meantime.
+        replayable = isinstance(request.data, (bytes, bytearray, type(None)))
+
+        while True:
+            connection, reused = self._acquire(
+                origin, timeout, reuse=replayable
+            )
+            attached = cancellation is None or cancellation.attach(connection)
+            if not attached:
+                self._release(origin, connection)
+                raise URLError('Request cancelled')
+            try:
+                if connection.sock is None:
+                    connection.connect()
+            except socket.error as e:
+                connection.close()
+                raise URLError(e)
+
+            try:
+                connection.request(method, path, request.data, headers)
+            except socket.timeout:
+                connection.close()
+                raise
+            except socket.error as e:
+                connection.close()
+                if reused:
+                    # The server closed the idle connection in the meantime,
+                    # so it did not get the request.
+                    logger.debug('Retrying on a new connection: %s', url)
+                    continue
+                raise URLError(e)
+            except Exception:
+                connection.close()
+                raise
+
+            # Once the request is sent, it is never sent again: the server may
+            # have processed it, and publishes are not idempotent.
+            try:
+                response = connection.getresponse()
+                body = response.read()
+            except socket.timeout:
+                connection.close()
+                raise
+            except (BadStatusLine, socket.error) as e:
+                connection.close()
+                if isinstance(e, socket.error):
+                    # Like the server dropping the connection, or a TLS 1.3
+                    # server rejecting the client certificate, which is only
+                    # told after the handshake.
+                    raise URLError(e)
+                raise
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        if cancellation is not None and not cancellation.detach():
+            # The connection may have been shut down.
+            connection.close()
+        elif response.will_close:
+            connection.close()
+        else:
+            self._release(origin, connection)
+
+        if response.status >= 400:
+            raise HTTPError(
+                url, response.status, response.reason, response.msg,
+                io.BytesIO(body)
+            )
+
+        return json.loads(body.decode('utf-8'))
+
+
+class TCPTransport(HTTPTransport):
+
+    def __init__(self, pool_size=4, backend=None, dns_ttl=60,
+                 ssl_context=None, cafile=None, certfile=None, keyfile=None,
+                 resume_sessions=True):
+        """
+        Transport talking HTTP, or HTTPS, to Crossbar.io nodes over TCP.
+
+        All the HTTPS connections share a single SSL context, and resume the
+        TLS session of their node, so only the first connection to every node
+        pays a full handshake.
+
+        :param pool_size: Maximum number of idle connections kept open for
+        every node.
+        :param backend: The concurrency backend. Defaults to threads.
+        :param dns_ttl: Seconds the resolved addresses of the nodes are
+        cached. ``None`` or ``0`` resolve them for every new connection.
+        :param ssl_context: The ``ssl.SSLContext`` for HTTPS connections,
+        which may be shared with other transports. If given, ``cafile``,
+        ``certfile`` and ``keyfile`` are ignored.
+        :param cafile: Path of the CA bundle the node certificates must be
+        signed by. Defaults to the system CA certificates.
+        :param certfile: Path of the client certificate, for nodes requiring
+        one. It may contain the private key too.
+        :param keyfile: Path of the private key of the client certificate.
+        :param resume_sessions: Whether to resume TLS sessions across
+        connections.
+        """
+        super(TCPTransport, self).__init__(
+            pool_size=pool_size, backend=backend
+        )
+        self.dns_cache = None
+        if dns_ttl:
+            self.dns_cache = DNSCache(dns_ttl, backend=self.backend)
+        self.cafile = cafile
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.tls_sessions = {} if resume_sessions else None
+        self._ssl_context = ssl_context
+
+    @property
+    def ssl_context(self):
+        """
+        The SSL context shared by all the HTTPS connections, created on first
+        use from ``cafile``, ``certfile`` and ``keyfile`` unless given.
+        """
+        with self._lock:
+            if self._ssl_context is None:
+                context = self.backend.ssl.create_default_context(
+                    cafile=self.cafile
+                )
+                if self.certfile is not None:
+                    context.load_cert_chain(self.certfile, self.keyfile)
+                self._ssl_context = context
+
+        return self._ssl_context
+
+    def _new_connection(self, origin, timeout):
+        scheme, host, port = origin
+        secure = scheme == 'https'
+        return TCPHTTPConnection(
+            host, port or (443 if secure else 80), timeout=timeout,
+            backend=self.backend,
+            ssl_context=self.ssl_context if secure else None,
+            dns_cache=self.dns_cache,
+            tls_sessions=self.tls_sessions
+        )
+
+    def _release(self, origin, connection):
+        # The session ticket of the connection has arrived by now.
+        connection.save_session()
+        super(TCPTransport, self)._release(origin, connection)
+
+
+class UnixSocketTransport(HTTPTransport):
+
+    def __init__(self, path, pool_size=4, backend=None):
+        """
+        Transport talking HTTP to a Crossbar.io node running in the same host,
+        over a Unix domain socket.
+
+        :param path: The path of the Unix domain socket.
+        :param pool_size: Maximum number of idle connections kept open.
+        :param backend: The concurrency backend. Defaults to threads.
+        """
+        super(UnixSocketTransport, self).__init__(
+            pool_size=pool_size, backend=backend
+        )
+        self.path = path
+
+    def _origin(self, parsed):
+        # Whatever the URL, all the requests go through the same socket.
+        return self.path
+
+    def _new_connection(self, origin, timeout):
+        return UnixHTTPConnection(
+            self.path, timeout=timeout, backend=self.backend
+        )
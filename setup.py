@@ -31,6 +31,10 @@ setup(
     url='https://github.com/jose-lpa/crossbarhttp3',
     keywords=['wamp', 'crossbar.io', 'websockets', 'http-bridge'],
     install_requires=requirements,
+    extras_require={
+        'gevent': ['gevent'],
+        'eventlet': ['eventlet'],
+    },
     test_suite='tests',
     tests_require=test_requirements,
     classifiers=[
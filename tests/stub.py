@@ -0,0 +1,341 @@
+"""
+Stub Crossbar.io HTTP bridge, to run the tests and benchmarks locally without a
+real Crossbar.io node.
+
+It mimics the services of the ``joselpa/crossbar-http-bridge`` Docker image:
+
+- ``/publish`` and ``/call`` publish and call without signature.
+- ``/publish-signed`` and ``/call-signature`` require a request signed with
+  ``key`` and ``secret``.
+- Any other path answers a 404 error.
+
+The ``test.add`` procedure returns the sum of its arguments plus ``offset``,
+``test.length`` the length of its first argument, ``test.exception`` raises an
+error and any other procedure is not registered. Publishing to ``test.drop``
+closes the connection without answering, once the request has been read.
+
+With ``tls=True``, the stub talks HTTPS with the self-signed certificate in
+``certs/stub.pem``, which is its own CA (``certs/ca.pem``). It is valid for
+``127.0.0.1`` and ``localhost``, and may be used as client certificate too.
+"""
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import shutil
+import socket
+import ssl
+import tempfile
+import threading
+import time
+
+try:
+    # Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+    from urlparse import parse_qs, urlparse
+
+
+CERTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'certs')
+
+# The CA bundle to verify the stub certificate with.
+CA_FILE = os.path.join(CERTS_DIR, 'ca.pem')
+
+# The stub certificate and its private key.
+CERT_FILE = os.path.join(CERTS_DIR, 'stub.pem')
+
+
+class StubBridgeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        if self.request.family != socket.AF_UNIX:
+            # Headers and body are written apart. With Nagle's algorithm, the
+            # body would wait for the delayed ACK of the headers on persistent
+            # connections.
+            self.request.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, True
+            )
+        if isinstance(self.request, ssl.SSLSocket):
+            # Handshake in the thread of the connection, not the one
+            # accepting them.
+            self.request.do_handshake()
+            with self.server.lock:
+                self.server.handshake_count += 1
+                if self.request.session_reused:
+                    self.server.resumed_count += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        # Unix domain socket peers have no address.
+        return 'stub'
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        encoding = self.headers.get('Transfer-Encoding') or ''
+        if encoding.lower() != 'chunked':
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length)
+
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                # Skip the trailer.
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+        with self.server.lock:
+            self.server.chunked_count += 1
+        return b''.join(chunks)
+
+    def check_signature(self, query, body):
+        """
+        Verifies the request signature, the same way Crossbar.io does.
+
+        :return: The HTTP error status, or ``None`` if the signature is valid.
+        """
+        params = dict((k, v[0]) for k, v in parse_qs(query).items())
+        required = ('key', 'timestamp', 'seq', 'nonce', 'signature')
+        if not all(name in params for name in required):
+            return 400
+
+        hm = hmac.new(self.server.secret.encode('utf-8'), None, hashlib.sha256)
+        for name in ('key', 'timestamp', 'seq', 'nonce'):
+            hm.update(params[name].encode('utf-8'))
+        hm.update(body)
+        signature = base64.urlsafe_b64encode(hm.digest()).decode('ascii')
+
+        if params['key'] != self.server.key:
+            return 401
+        if params['signature'] != signature:
+            return 401
+
+        return None
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+
+        parsed = urlparse(self.path)
+        body = self.read_body()
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if parsed.path not in server.services:
+            self.send_json(404, {'error': 'No such service'})
+            return
+
+        if parsed.path in server.signed_services:
+            status = self.check_signature(parsed.query, body)
+            if status is not None:
+                self.send_json(status, {'error': 'Bad signature'})
+                return
+
+        try:
+            params = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self.send_json(400, {'error': 'Invalid JSON body'})
+            return
+
+        if params.get('topic') == 'test.drop':
+            self.close_connection = True
+        elif 'topic' in params:
+            self.send_json(200, {'id': next(server.ids)})
+        elif params.get('procedure') == 'test.add':
+            try:
+                result = sum(params.get('args') or [])
+                result += (params.get('kwargs') or {}).get('offset', 0)
+            except TypeError:
+                self.send_json(200, {
+                    'error': 'wamp.error.runtime_error',
+                    'args': ['Arguments must be numbers']
+                })
+                return
+            self.send_json(200, {'args': [result]})
+        elif params.get('procedure') == 'test.length':
+            self.send_json(200, {'args': [len(params['args'][0])]})
+        elif params.get('procedure') == 'test.exception':
+            self.send_json(200, {
+                'error': 'wamp.error.runtime_error',
+                'args': ['Procedure failed']
+            })
+        else:
+            self.send_json(200, {
+                'error': 'wamp.error.no_such_procedure',
+                'args': ['No such procedure']
+            })
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+
+class ThreadingHTTPSServer(ThreadingHTTPServer):
+
+    def __init__(self, address, handler, ssl_context):
+        ThreadingHTTPServer.__init__(self, address, handler)
+        self.ssl_context = ssl_context
+
+    def get_request(self):
+        sock, address = ThreadingHTTPServer.get_request(self)
+        sock = self.ssl_context.wrap_socket(
+            sock, server_side=True, do_handshake_on_connect=False
+        )
+        return sock, address
+
+    def handle_error(self, request, client_address):
+        # Failed handshakes, like clients rejecting the certificate.
+        pass
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class StubBridge(object):
+
+    def __init__(self, unix_socket=False, key='key', secret='secret', delay=0,
+                 tls=False, client_certs=False):
+        """
+        Runs a stub HTTP bridge in a background thread.
+
+        :param unix_socket: Whether to listen on a Unix domain socket instead
+        of a TCP port in localhost.
+        :param key: The key expected in signed requests.
+        :param secret: The secret expected in signed requests.
+        :param delay: Seconds to wait before answering every request.
+        :param tls: Whether to talk HTTPS instead of HTTP.
+        :param client_certs: Whether to require a client certificate signed
+        by ``CA_FILE``. Only with ``tls``.
+        """
+        self.unix_socket = unix_socket
+        self.tls = tls
+        self.client_certs = client_certs
+        self.key = key
+        self.secret = secret
+        self.delay = delay
+        self.server = None
+        self._tmpdir = None
+
+    @property
+    def url(self):
+        """
+        The base URL of the stub, without any service path.
+        """
+        if self.unix_socket:
+            return 'http+unix://{0}'.format(
+                self.socket_path.replace('/', '%2F')
+            )
+        return '{0}://127.0.0.1:{1}'.format(
+            'https' if self.tls else 'http', self.server.server_address[1]
+        )
+
+    @property
+    def request_count(self):
+        return self.server.request_count
+
+    @property
+    def chunked_count(self):
+        """
+        Number of requests received with chunked transfer encoding.
+        """
+        return self.server.chunked_count
+
+    @property
+    def handshake_count(self):
+        """
+        Number of TLS handshakes, full or resumed.
+        """
+        return self.server.handshake_count
+
+    @property
+    def resumed_count(self):
+        """
+        Number of TLS handshakes resuming a previous session.
+        """
+        return self.server.resumed_count
+
+    def _make_server(self):
+        if self.unix_socket:
+            self._tmpdir = tempfile.mkdtemp()
+            self.socket_path = os.path.join(self._tmpdir, 'crossbar.sock')
+            return ThreadingUnixHTTPServer(self.socket_path, StubBridgeHandler)
+        if self.tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(CERT_FILE)
+            if self.client_certs:
+                context.verify_mode = ssl.CERT_REQUIRED
+                context.load_verify_locations(CA_FILE)
+            return ThreadingHTTPSServer(
+                ('127.0.0.1', 0), StubBridgeHandler, context
+            )
+        return ThreadingHTTPServer(('127.0.0.1', 0), StubBridgeHandler)
+
+    def start(self):
+        self.server = self._make_server()
+        self.server.key = self.key
+        self.server.secret = self.secret
+        self.server.delay = self.delay
+        self.server.services = (
+            '/publish', '/call', '/publish-signed', '/call-signature'
+        )
+        self.server.signed_services = ('/publish-signed', '/call-signature')
+        self.server.ids = itertools.count(1)
+        self.server.request_count = 0
+        self.server.chunked_count = 0
+        self.server.handshake_count = 0
+        self.server.resumed_count = 0
+        self.server.lock = threading.Lock()
+
+        thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05}
+        )
+        thread.daemon = True
+        thread.start()
+
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
@@ -0,0 +1,149 @@
+import ssl
+import time
+import unittest
+
+from crossbarhttp import Client
+from crossbarhttp.cooperative import get_backend, ThreadingBackend
+from crossbarhttp.transport import TCPTransport
+
+from .stub import CA_FILE, StubBridge
+
+try:
+    import gevent
+    import gevent.pool
+except ImportError:
+    gevent = None
+
+try:
+    import eventlet
+except ImportError:
+    eventlet = None
+
+# Concurrent requests in flight, and how long the stub takes to answer each.
+CONCURRENCY = 200
+DELAY = 0.2
+
+
+class GetBackendTests(unittest.TestCase):
+    def test_default(self):
+        self.assertTrue(isinstance(get_backend(), ThreadingBackend))
+        self.assertTrue(isinstance(get_backend(False), ThreadingBackend))
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, get_backend, 'twisted')
+
+    def test_client_default(self):
+        """
+        Without cooperative mode the client uses ``urlopen`` and threads.
+        """
+        client = Client('http://localhost:8001/call')
+        self.assertEqual(client.transport, None)
+        self.assertEqual(client.backend.name, 'threading')
+
+
+class CooperativeTestsMixin(object):
+    backend = None
+
+    def setUp(self):
+        self.bridge = StubBridge(delay=DELAY).start()
+        self.client = Client(
+            self.bridge.url + '/publish',
+            timeout=10,
+            cooperative=self.backend
+        )
+
+    def tearDown(self):
+        self.client.transport.close()
+        self.bridge.stop()
+
+    def run_concurrently(self, function, count):
+        """
+        Runs ``function`` ``count`` times concurrently in green threads, and
+        returns the results.
+        """
+        raise NotImplementedError
+
+    def test_client_instantiation(self):
+        """
+        Cooperative mode pools connections over green sockets.
+        """
+        self.assertEqual(self.client.backend.name, self.backend)
+        self.assertTrue(isinstance(self.client.transport, TCPTransport))
+        self.assertTrue(self.client.transport.backend is self.client.backend)
+
+    def test_concurrent_publish(self):
+        """
+        A single worker keeps hundreds of requests in flight at once.
+        """
+        started = time.time()
+        results = self.run_concurrently(
+            lambda: self.client.publish('test.publish', 1), CONCURRENCY
+        )
+        elapsed = time.time() - started
+
+        self.assertEqual(len(set(results)), CONCURRENCY)
+        self.assertTrue(None not in results)
+        # Sequentially, it would take CONCURRENCY * DELAY seconds.
+        self.assertTrue(elapsed < CONCURRENCY * DELAY / 4, elapsed)
+
+    def test_concurrent_https_calls(self):
+        """
+        TLS sockets yield to the hub too, whether the SSL context is created
+        by the client or given to it.
+        """
+        bridge = StubBridge(delay=DELAY, tls=True).start()
+        self.addCleanup(bridge.stop)
+        url = bridge.url + '/call'
+        count = 20
+
+        for options in (
+                {'cafile': CA_FILE},
+                {'ssl_context': ssl.create_default_context(cafile=CA_FILE)}):
+            client = Client(
+                url, timeout=10, cooperative=self.backend, **options
+            )
+            self.addCleanup(client.transport.close)
+
+            started = time.time()
+            results = self.run_concurrently(
+                lambda: client.call('test.add', 2, 3), count
+            )
+            elapsed = time.time() - started
+
+            self.assertEqual(results, [5] * count)
+            # Sequentially, it would take count * DELAY seconds.
+            self.assertTrue(elapsed < count * DELAY / 4, elapsed)
+
+    def test_hedged_call(self):
+        """
+        Hedged calls run their attempts in green threads.
+        """
+        client = Client(
+            self.bridge.url + '/call',
+            timeout=10,
+            cooperative=self.backend,
+            hedge_procedures=['test.add']
+        )
+        client.latency.min_samples = 1
+        client.latency.record('test.add', DELAY / 2)
+
+        self.assertEqual(client.call('test.add', 2, 3), 5)
+        self.assertEqual(self.bridge.request_count, 2)
+
+
+@unittest.skipIf(gevent is None, 'gevent is not installed')
+class GeventTests(CooperativeTestsMixin, unittest.TestCase):
+    backend = 'gevent'
+
+    def run_concurrently(self, function, count):
+        pool = gevent.pool.Pool(count)
+        return pool.map(lambda _: function(), range(count))
+
+
+@unittest.skipIf(eventlet is None, 'eventlet is not installed')
+class EventletTests(CooperativeTestsMixin, unittest.TestCase):
+    backend = 'eventlet'
+
+    def run_concurrently(self, function, count):
+        pool = eventlet.GreenPool(count)
+        return list(pool.imap(lambda _: function(), range(count)))
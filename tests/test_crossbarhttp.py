@@ -1,4 +1,7 @@
 import json
+import socket
+import threading
+import time
 import unittest
 
 # Mock facility for unit testing.
@@ -479,3 +482,211 @@ class TestClient(unittest.TestCase):
 
         # `Request` object is instantiated with this `data`:
         request_mock.assert_called_with(self.crossbar_client.url, None, {})
+
+
+class TestClientLatency(unittest.TestCase):
+    def setUp(self):
+        self.crossbar_client = Client(
+            'http://localhost:8001/call',
+            timeout=5,
+            hedge_procedures=['test.idempotent'],
+            hedge_urls=['http://localhost:8002/call']
+        )
+        self.crossbar_client.latency.min_samples = 1
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_latency_recorded(self, api_call_mock):
+        """
+        The latency of successful calls is recorded per procedure, when
+        needed for hedging or adaptive timeouts.
+        """
+        api_call_mock.return_value = {'args': [15]}
+        latency = self.crossbar_client.latency
+
+        self.crossbar_client.call('test.idempotent', 2, 3, offset=10)
+        self.assertNotEqual(latency.percentile('test.idempotent', 50), None)
+        self.assertEqual(latency.percentile('test.other', 50), None)
+
+        # Not hedged.
+        self.crossbar_client.call('test.add', 2, 3, offset=10)
+        self.assertEqual(latency.percentile('test.add', 50), None)
+
+        self.crossbar_client.adaptive_timeout = True
+        self.crossbar_client.call('test.add', 2, 3, offset=10)
+        self.assertNotEqual(latency.percentile('test.add', 50), None)
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_static_timeout(self, api_call_mock):
+        """
+        Without ``adaptive_timeout``, requests use the static timeout.
+        """
+        api_call_mock.return_value = {'args': [15]}
+        self.crossbar_client.latency.record('test.add', 0.1)
+
+        self.crossbar_client.call('test.add', 2, 3, offset=10)
+        self.assertEqual(api_call_mock.call_args[1]['timeout'], 5)
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_adaptive_timeout(self, api_call_mock):
+        """
+        With ``adaptive_timeout``, requests use a timeout derived from the
+        observed latency of the procedure.
+        """
+        api_call_mock.return_value = {'args': [15]}
+        self.crossbar_client.adaptive_timeout = True
+
+        self.crossbar_client.call('test.add', 2, 3, offset=10)
+        self.assertEqual(api_call_mock.call_args[1]['timeout'], 5)
+
+        self.crossbar_client.latency.reset()
+        self.crossbar_client.latency.record('test.add', 0.1)
+        self.crossbar_client.call('test.add', 2, 3, offset=10)
+        self.assertAlmostEqual(api_call_mock.call_args[1]['timeout'], 0.2)
+
+    @mock.patch('crossbarhttp.crossbarhttp.monotonic')
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_adaptive_timeout_raised(self, api_call_mock, monotonic_mock):
+        """
+        The adaptive timeout grows when the latency of a procedure shifts
+        upwards, even if all the requests time out meanwhile.
+        """
+        clock = [100.0]
+        monotonic_mock.side_effect = lambda: clock[0]
+
+        def make_api_call(method, url, json_params=None, timeout=None,
+                          request_info=None):
+            # The procedure now takes 300ms.
+            clock[0] += min(timeout, 0.3)
+            if timeout < 0.3:
+                raise socket.timeout('timed out')
+            return {'args': [15]}
+
+        api_call_mock.side_effect = make_api_call
+        self.crossbar_client.adaptive_timeout = True
+        self.crossbar_client.latency.min_samples = 20
+        for _ in range(50):
+            self.crossbar_client.latency.record('test.add', 0.01)
+
+        timeouts = 0
+        for _ in range(20):
+            try:
+                self.assertEqual(self.crossbar_client.call('test.add'), 15)
+                break
+            except socket.timeout:
+                timeouts += 1
+        else:
+            self.fail('The adaptive timeout was never raised')
+
+        self.assertTrue(timeouts > 0)
+        self.assertTrue(api_call_mock.call_args[1]['timeout'] >= 0.3)
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_hedge_not_triggered(self, api_call_mock):
+        """
+        No duplicate is sent if the response arrives before the p95 latency.
+        """
+        api_call_mock.return_value = {'args': [15]}
+        self.crossbar_client.latency.record('test.idempotent', 1.0)
+
+        self.assertEqual(self.crossbar_client.call('test.idempotent'), 15)
+        self.assertEqual(api_call_mock.call_count, 1)
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_hedge_without_history(self, api_call_mock):
+        """
+        No duplicate is sent while the procedure has no latency history.
+        """
+        api_call_mock.return_value = {'args': [15]}
+        self.crossbar_client.latency.min_samples = 20
+
+        self.assertEqual(self.crossbar_client.call('test.idempotent'), 15)
+        self.assertEqual(api_call_mock.call_count, 1)
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_hedge_fastest_response_wins(self, api_call_mock):
+        """
+        A duplicate is sent to the hedge URL once the p95 latency passes, and
+        the first response is returned.
+        """
+        release = threading.Event()
+
+        def api_call(method, url, json_params=None, timeout=None,
+                     request_info=None, cancellation=None):
+            if url == self.crossbar_client.url:
+                release.wait(5)
+                return {'args': ['primary']}
+            return {'args': ['hedge']}
+
+        api_call_mock.side_effect = api_call
+        self.crossbar_client.latency.record('test.idempotent', 0.01)
+
+        try:
+            self.assertEqual(
+                self.crossbar_client.call('test.idempotent'),
+                'hedge'
+            )
+        finally:
+            release.set()
+
+        urls = [c[0][1] for c in api_call_mock.call_args_list]
+        self.assertEqual(
+            urls,
+            ['http://localhost:8001/call', 'http://localhost:8002/call']
+        )
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_hedge_failure_waits_for_other(self, api_call_mock):
+        """
+        A failed attempt does not fail the call while the other one is still
+        in flight.
+        """
+        def api_call(method, url, json_params=None, timeout=None,
+                     request_info=None, cancellation=None):
+            if url == self.crossbar_client.url:
+                time.sleep(0.1)
+                return {'args': ['primary']}
+            raise ClientBadHost('hedge failed')
+
+        api_call_mock.side_effect = api_call
+        self.crossbar_client.latency.record('test.idempotent', 0.01)
+
+        self.assertEqual(
+            self.crossbar_client.call('test.idempotent'),
+            'primary'
+        )
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_hedge_all_failed(self, api_call_mock):
+        """
+        If every attempt fails, the first error is raised.
+        """
+        def api_call(method, url, json_params=None, timeout=None,
+                     request_info=None, cancellation=None):
+            if url == self.crossbar_client.url:
+                time.sleep(0.1)
+                raise ClientBadHost('primary failed')
+            raise ClientBadUrl('hedge failed')
+
+        api_call_mock.side_effect = api_call
+        self.crossbar_client.latency.record('test.idempotent', 0.01)
+
+        self.assertRaises(
+            ClientBadUrl,
+            self.crossbar_client.call, 'test.idempotent'
+        )
+
+    @mock.patch('crossbarhttp.Client._make_api_call')
+    def test_non_idempotent_not_hedged(self, api_call_mock):
+        """
+        Procedures not listed in ``hedge_procedures`` are never hedged.
+        """
+        def api_call(method, url, json_params=None, timeout=None,
+                     request_info=None, cancellation=None):
+            time.sleep(0.05)
+            return {'args': [15]}
+
+        api_call_mock.side_effect = api_call
+        self.crossbar_client.latency.record('test.add', 0.01)
+
+        self.assertEqual(self.crossbar_client.call('test.add'), 15)
+        self.assertEqual(api_call_mock.call_count, 1)
@@ -0,0 +1,103 @@
+import subprocess
+import sys
+import unittest
+
+# Modules that must not be imported until the first request is sent.
+HEAVY_MODULES = (
+    'crossbarhttp.transport', 'datetime', 'email', 'http.client', 'json',
+    'random', 'ssl', 'urllib.request'
+)
+
+# Maximum number of modules importing the package and creating a client may
+# add, and the time it may take, as a multiple of the time ``import json``
+# takes on the same machine. Importing the heavy modules eagerly takes about
+# 8 times as long.
+MODULE_BUDGET = 60
+TIME_BUDGET = 5
+
+SCRIPT = """
+import sys
+import time
+
+before = set(sys.modules)
+started = time.time()
+{0}
+elapsed = time.time() - started
+
+print(elapsed)
+print(' '.join(sorted(set(sys.modules) - before)))
+"""
+
+CLIENT_IMPORT = """
+from crossbarhttp import Client
+Client('http://localhost:8001/publish')
+"""
+
+REFERENCE_IMPORT = "import json"
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'Lazy imports require PEP 562')
+class ImportBudgetTests(unittest.TestCase):
+    def run_script(self, code=CLIENT_IMPORT):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT.format(code)]
+        )
+        elapsed, modules = output.decode('utf-8').splitlines()
+        return float(elapsed), modules.split()
+
+    def test_heavy_modules_not_imported(self):
+        """
+        Importing the package and creating a client does not import the
+        modules only needed to send requests.
+        """
+        elapsed, modules = self.run_script()
+
+        for name in HEAVY_MODULES:
+            imported = [
+                m for m in modules if m == name or m.startswith(name + '.')
+            ]
+            self.assertEqual(imported, [], '{0} imported eagerly'.format(name))
+
+    def test_module_budget(self):
+        elapsed, modules = self.run_script()
+        self.assertTrue(
+            len(modules) <= MODULE_BUDGET,
+            '{0} modules imported, budget is {1}: {2}'.format(
+                len(modules), MODULE_BUDGET, ' '.join(modules)
+            )
+        )
+
+    def test_time_budget(self):
+        # Best of several interleaved runs, to rule out noise from the
+        # machine, relative to a reference import so it does not depend on
+        # how fast the machine is.
+        elapsed = []
+        reference = []
+        for _ in range(5):
+            elapsed.append(self.run_script()[0])
+            reference.append(self.run_script(REFERENCE_IMPORT)[0])
+        elapsed, reference = min(elapsed), min(reference)
+
+        self.assertTrue(
+            elapsed <= reference * TIME_BUDGET,
+            'Import took {0:.3f}s, budget is {1} times {2:.3f}s'.format(
+                elapsed, TIME_BUDGET, reference
+            )
+        )
+
+    def test_lazy_attributes(self):
+        """
+        Lazily imported names are still available as attributes.
+        """
+        import crossbarhttp
+        from crossbarhttp import compat
+        from crossbarhttp.transport import UnixSocketTransport
+
+        self.assertTrue(
+            crossbarhttp.UnixSocketTransport is UnixSocketTransport
+        )
+        self.assertTrue(
+            issubclass(compat.HTTPError, compat.URLError)
+        )
+        self.assertRaises(AttributeError, getattr, crossbarhttp, 'missing')
+        self.assertRaises(AttributeError, getattr, compat, 'missing')
@@ -0,0 +1,114 @@
+import unittest
+
+from crossbarhttp import LatencyTracker
+
+
+class LatencyTrackerTests(unittest.TestCase):
+    def setUp(self):
+        self.tracker = LatencyTracker(window=100, min_samples=10)
+
+    def fill(self, key, samples):
+        for sample in samples:
+            self.tracker.record(key, sample)
+
+    def test_percentile_not_enough_samples(self):
+        """
+        No percentile is reported until ``min_samples`` samples were recorded.
+        """
+        self.fill('com.example.add', [0.1] * 9)
+        self.assertEqual(self.tracker.percentile('com.example.add', 95), None)
+        self.assertEqual(self.tracker.percentile('com.example.sub', 95), None)
+
+    def test_percentile(self):
+        """
+        Percentiles are computed with the nearest-rank method.
+        """
+        self.fill('com.example.add', [i / 100.0 for i in range(1, 101)])
+
+        self.assertEqual(self.tracker.percentile('com.example.add', 50), 0.5)
+        self.assertEqual(self.tracker.percentile('com.example.add', 95), 0.95)
+        self.assertEqual(self.tracker.percentile('com.example.add', 100), 1.0)
+        self.assertEqual(self.tracker.percentile('com.example.add', 0), 0.01)
+
+    def test_window(self):
+        """
+        Only the most recent ``window`` samples are taken into account.
+        """
+        self.fill('com.example.add', [10.0] * 100)
+        self.fill('com.example.add', [0.1] * 100)
+
+        self.assertEqual(self.tracker.percentile('com.example.add', 100), 0.1)
+
+    def test_percentile_per_key(self):
+        """
+        Samples of different keys do not affect each other.
+        """
+        self.fill('com.example.fast', [0.01] * 10)
+        self.fill('com.example.slow', [2.0] * 10)
+
+        self.assertEqual(self.tracker.percentile('com.example.fast', 99), 0.01)
+        self.assertEqual(self.tracker.percentile('com.example.slow', 99), 2.0)
+
+    def test_timeout_for_unknown_key(self):
+        """
+        The static timeout is used while a key has too few samples.
+        """
+        self.assertEqual(self.tracker.timeout_for('com.example.add', 5), 5)
+        self.assertEqual(self.tracker.timeout_for('com.example.add'), None)
+
+    def test_timeout_for(self):
+        """
+        The adaptive timeout is the p99 latency times ``factor``, bounded by
+        ``minimum`` and by the static timeout.
+        """
+        self.fill('com.example.add', [0.5] * 10)
+        self.assertEqual(self.tracker.timeout_for('com.example.add', 5), 1.0)
+        self.assertEqual(self.tracker.timeout_for('com.example.add', 0.8), 0.8)
+        self.assertEqual(self.tracker.timeout_for('com.example.add'), 1.0)
+
+        self.fill('com.example.fast', [0.001] * 10)
+        self.assertEqual(
+            self.tracker.timeout_for('com.example.fast', 5),
+            self.tracker.minimum
+        )
+
+    def test_reset(self):
+        self.fill('com.example.add', [0.5] * 10)
+        self.fill('com.example.other', [0.5] * 10)
+
+        self.tracker.reset('com.example.add')
+        self.assertEqual(self.tracker.percentile('com.example.add', 50), None)
+        self.assertEqual(self.tracker.percentile('com.example.other', 50), 0.5)
+
+        self.tracker.reset()
+        self.assertEqual(self.tracker.percentile('com.example.add', 50), None)
+        self.assertEqual(
+            self.tracker.percentile('com.example.other', 50),
+            None
+        )
+
+    def test_max_keys(self):
+        """
+        Beyond ``max_keys``, the least recently recorded key is forgotten.
+        """
+        tracker = LatencyTracker(min_samples=1, max_keys=2)
+        tracker.record('com.example.add', 0.1)
+        tracker.record('com.example.sub', 0.1)
+        tracker.record('com.example.add', 0.1)
+        tracker.record('com.example.mul', 0.1)
+
+        self.assertEqual(tracker.percentile('com.example.sub', 50), None)
+        self.assertEqual(tracker.percentile('com.example.add', 50), 0.1)
+        self.assertEqual(tracker.percentile('com.example.mul', 50), 0.1)
+
+    def test_max_keys_after_reset(self):
+        tracker = LatencyTracker(min_samples=1, max_keys=2)
+        tracker.record('com.example.add', 0.1)
+        tracker.record('com.example.sub', 0.1)
+        tracker.reset('com.example.add')
+        tracker.record('com.example.mul', 0.1)
+        tracker.record('com.example.div', 0.1)
+
+        self.assertEqual(tracker.percentile('com.example.sub', 50), None)
+        self.assertEqual(tracker.percentile('com.example.mul', 50), 0.1)
+        self.assertEqual(tracker.percentile('com.example.div', 50), 0.1)
@@ -0,0 +1,194 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from crossbarhttp import (
+    Client, ClientBadHost, ClientNoCalleeRegistered, Recorder
+)
+from crossbarhttp.recording import CapturedRequest, read_capture
+from crossbarhttp.streaming import count_bytes
+
+from .stub import StubBridge
+
+
+class RecorderTests(unittest.TestCase):
+    def setUp(self):
+        self.capture = io.BytesIO()
+        self.recorder = Recorder(self.capture)
+        self.origin = self.recorder._origin
+
+    def read(self):
+        return list(read_capture(io.BytesIO(self.capture.getvalue())))
+
+    def test_record(self):
+        self.recorder.record(
+            'publish', 'test.publish', 100, 'ok', 0.0123456789,
+            self.origin + 1.5
+        )
+        self.recorder.record(
+            'call', 'test.add', None, 'ClientBadHost', 0.5, self.origin + 2
+        )
+
+        self.assertEqual(self.recorder.count, 2)
+        self.assertEqual(self.read(), [
+            CapturedRequest(
+                1.5, 'publish', 'test.publish', 100, 'ok', 0.012346
+            ),
+            CapturedRequest(2, 'call', 'test.add', None, 'ClientBadHost', 0.5),
+        ])
+
+    def test_compact_format(self):
+        self.recorder.record(
+            'call', 'test.add', 2, 'ok', 0.001, self.origin + 1
+        )
+        lines = self.capture.getvalue().decode('utf-8').splitlines()
+
+        self.assertEqual(json.loads(lines[0])['version'], 1)
+        self.assertEqual(lines[1], '[1.0,"c","test.add",2,"ok",0.001]')
+
+    def test_write_error_not_raised(self):
+        self.capture.close()
+        self.recorder.record('call', 'test.add', 2, 'ok', 0.001, self.origin)
+        self.assertEqual(self.recorder.count, 0)
+
+    def test_record_error_not_raised(self):
+        self.recorder.record(
+            'subscribe', 'test.add', 2, 'ok', 0.001, self.origin
+        )
+        self.recorder.record('call', 'test.add', 2, 'ok', None, self.origin)
+        self.assertEqual(self.recorder.count, 0)
+
+    def test_compressed_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'capture.jsonl.gz')
+
+        with Recorder(path) as recorder:
+            recorder.record('call', 'test.add', 2, 'ok', 0.001, self.origin)
+
+        with open(path, 'rb') as capture:
+            # Gzip magic number.
+            self.assertEqual(capture.read(2), b'\x1f\x8b')
+        self.assertEqual(
+            [request.name for request in read_capture(path)], ['test.add']
+        )
+
+    def test_read_not_a_capture(self):
+        capture = io.BytesIO(b'[1.0,"c","test.add",2,"ok",0.001]\n')
+        self.assertRaises(ValueError, list, read_capture(capture))
+        self.assertRaises(ValueError, list, read_capture(io.BytesIO()))
+
+    def test_read_unsupported_version(self):
+        capture = io.BytesIO(b'{"version":2,"started":0}\n')
+        self.assertRaises(ValueError, list, read_capture(capture))
+
+    def test_count_bytes(self):
+        request_info = {'size': 0}
+        chunks = count_bytes(iter([b'abc', b'de']), request_info)
+
+        self.assertEqual(request_info['size'], 0)
+        self.assertEqual(b''.join(chunks), b'abcde')
+        self.assertEqual(request_info['size'], 5)
+
+
+class ClientRecordingTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge().start()
+        self.capture = io.BytesIO()
+        self.recorder = Recorder(self.capture)
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def read(self):
+        return list(read_capture(io.BytesIO(self.capture.getvalue())))
+
+    def test_publish_and_call(self):
+        """
+        Requests of several clients are recorded in the order they were sent,
+        with their outcome.
+        """
+        publisher = Client(
+            self.bridge.url + '/publish', recorder=self.recorder, timeout=5
+        )
+        caller = Client(
+            self.bridge.url + '/call', recorder=self.recorder, timeout=5
+        )
+
+        publisher.publish('test.publish', 'payload')
+        self.assertEqual(caller.call('test.add', 2, 3), 5)
+        self.assertRaises(
+            ClientNoCalleeRegistered, caller.call, 'test.does_not_exist'
+        )
+
+        requests = self.read()
+        self.assertEqual(
+            [(request.method, request.name, request.outcome)
+             for request in requests],
+            [
+                ('publish', 'test.publish', 'ok'),
+                ('call', 'test.add', 'ok'),
+                (
+                    'call', 'test.does_not_exist',
+                    'wamp.error.no_such_procedure'
+                ),
+            ]
+        )
+        self.assertTrue(requests[0].offset <= requests[1].offset)
+        self.assertTrue(all(request.latency > 0 for request in requests))
+        self.assertEqual(requests[1].size, len(json.dumps({
+            'procedure': 'test.add', 'args': [2, 3], 'kwargs': {}
+        })))
+
+    def test_streamed_size(self):
+        client = Client(
+            self.bridge.url + '/publish', recorder=self.recorder, timeout=5
+        )
+        client.publish('test.publish', iter(['a', 'b']))
+
+        self.assertEqual(self.read()[0].size, len(json.dumps({
+            'topic': 'test.publish', 'args': [['a', 'b']], 'kwargs': {}
+        })))
+
+    def test_not_serializable(self):
+        """
+        Requests failing before being sent are recorded without a size.
+        """
+        client = Client(
+            self.bridge.url + '/call', recorder=self.recorder, timeout=5
+        )
+        self.assertRaises(TypeError, client.call, 'test.add', object())
+        self.assertEqual(self.read()[0].size, None)
+        self.assertEqual(self.read()[0].outcome, 'TypeError')
+
+    def test_failed_request(self):
+        client = Client(
+            'http://127.0.0.1:1/call', recorder=self.recorder, timeout=5
+        )
+        self.assertRaises(ClientBadHost, client.call, 'test.add', 2, 3)
+        self.assertEqual(self.read()[0].outcome, 'ClientBadHost')
+
+    def test_recorder_path(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'capture.jsonl')
+
+        client = Client(self.bridge.url + '/call', recorder=path, timeout=5)
+        self.assertTrue(isinstance(client.recorder, Recorder))
+
+        client.call('test.add', 2, 3)
+        client.close()
+        self.assertTrue(client.recorder._file.closed)
+        self.assertEqual(len(list(read_capture(path))), 1)
+
+    def test_shared_recorder_not_closed(self):
+        with Client(
+            self.bridge.url + '/call', recorder=self.recorder, timeout=5
+        ) as client:
+            client.call('test.add', 2, 3)
+
+        self.assertFalse(self.capture.closed)
+        self.assertEqual(len(self.read()), 1)
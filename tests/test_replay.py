@@ -0,0 +1,130 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Mock facility for unit testing.
+try:
+    # Python 3
+    import unittest.mock as mock
+except ImportError:
+    # Python 2
+    import mock
+
+from crossbarhttp import Recorder, Replayer
+from crossbarhttp.replay import main, make_payload
+
+from .stub import StubBridge
+
+
+class ReplayerTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge().start()
+        self.publish_url = self.bridge.url + '/publish'
+        self.call_url = self.bridge.url + '/call'
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def make_capture(self, requests):
+        """
+        Writes a capture of ``(offset, method, name, size)`` requests.
+        """
+        capture = io.BytesIO()
+        recorder = Recorder(capture)
+        for offset, method, name, size in requests:
+            recorder.record(
+                method, name, size, 'ok', 0.001, recorder._origin + offset
+            )
+
+        capture.seek(0)
+        return capture
+
+    def test_make_payload(self):
+        for method in ('publish', 'call'):
+            args = make_payload(method, 'test.add', 1000)
+            key = 'topic' if method == 'publish' else 'procedure'
+            body = json.dumps({key: 'test.add', 'args': args, 'kwargs': {}})
+            self.assertEqual(len(body), 1000)
+
+        self.assertEqual(make_payload('call', 'test.add', None), ())
+
+    def test_replay(self):
+        capture = self.make_capture(
+            [(i * 0.001, 'publish', 'test.publish', 200) for i in range(20)] +
+            [(i * 0.001, 'call', 'test.add', 100) for i in range(10)] +
+            [(0.02, 'call', 'test.does_not_exist', 100)]
+        )
+        with Replayer(
+            capture, publish_url=self.publish_url, call_url=self.call_url,
+            speed=0, concurrency=4, timeout=5, warmup=4
+        ) as replayer:
+            report = replayer.run()
+            transport = replayer.clients['call'].transport
+            self.assertTrue(transport._idle)
+
+        self.assertEqual(transport._idle, {})
+
+        self.assertEqual(report.requests, 31)
+        self.assertEqual(self.bridge.request_count, 31)
+        self.assertEqual(report.outcomes, {
+            'ok': 20,
+            # Replayed payloads are not numbers.
+            'wamp.error.runtime_error': 10,
+            'wamp.error.no_such_procedure': 1,
+        })
+        self.assertTrue(report.throughput > 0)
+        self.assertTrue(0 < report.latency[50] <= report.latency[99])
+        self.assertEqual(report.recorded_latency[99], 0.001)
+        self.assertTrue('Throughput' in str(report))
+
+    def test_skipped(self):
+        capture = self.make_capture([
+            (0, 'publish', 'test.publish', 100),
+            (0, 'call', 'test.add', 100),
+        ])
+        with Replayer(capture, publish_url=self.publish_url) as replayer:
+            report = replayer.run()
+
+        self.assertEqual(report.requests, 1)
+        self.assertEqual(report.skipped, 1)
+
+    def test_speed(self):
+        """
+        Requests keep their recorded timing, scaled by the speed.
+        """
+        requests = [(0, 'publish', 'test.publish', 100),
+                    (0.3, 'publish', 'test.publish', 100)]
+
+        with Replayer(
+            self.make_capture(requests), publish_url=self.publish_url
+        ) as replayer:
+            report = replayer.run()
+        self.assertTrue(report.duration >= 0.3)
+
+        with Replayer(
+            self.make_capture(requests), publish_url=self.publish_url,
+            speed=3
+        ) as replayer:
+            report = replayer.run()
+        self.assertTrue(0.1 <= report.duration < 0.3)
+
+    def test_main(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'capture.jsonl')
+        with open(path, 'wb') as capture:
+            capture.write(
+                self.make_capture([(0, 'call', 'test.add', 100)]).read()
+            )
+
+        with mock.patch.object(sys, 'stdout', io.StringIO()) as stdout:
+            main([
+                path, '--call-url', self.call_url, '--speed', '0',
+                '--concurrency', '2'
+            ])
+
+        self.assertTrue('Requests:   1 in' in stdout.getvalue())
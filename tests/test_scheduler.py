@@ -0,0 +1,215 @@
+import threading
+import time
+import unittest
+
+from crossbarhttp import (
+    Client, ClientBadHost, ClientQueueFull, Scheduler
+)
+
+from .stub import StubBridge
+
+
+class RecordingClient(Client):
+    """
+    Client recording the order requests are sent in, instead of sending them.
+    Requests to topics in ``blocked`` wait until ``release`` is set.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingClient, self).__init__(*args, **kwargs)
+        self.sent = []
+        self.blocked = set()
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def publish(self, topic, *args, **kwargs):
+        with self.lock:
+            self.sent.append(topic)
+        if topic in self.blocked:
+            self.release.wait(5)
+        if topic == 'test.fail':
+            raise ClientBadHost('failed')
+        return len(self.sent)
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.client = RecordingClient('http://localhost:8001/publish')
+        self.client.blocked.add('test.block')
+
+    def tearDown(self):
+        self.client.release.set()
+
+    def make_scheduler(self, **kwargs):
+        scheduler = Scheduler(self.client, **kwargs)
+        self.addCleanup(scheduler.close, timeout=5)
+        return scheduler
+
+    def wait_sent(self, count):
+        for _ in range(500):
+            if len(self.client.sent) >= count:
+                return
+            time.sleep(0.01)
+
+    def test_publish(self):
+        scheduler = self.make_scheduler()
+        request = scheduler.publish('test.publish', 1, key='value')
+
+        self.assertEqual(request.result(), 1)
+        self.assertTrue(request.done())
+        self.assertEqual(request.lane, 'normal')
+
+    def test_publish_error(self):
+        scheduler = self.make_scheduler()
+        request = scheduler.publish('test.fail')
+        self.assertRaises(ClientBadHost, request.result)
+
+    def test_routes(self):
+        scheduler = self.make_scheduler(
+            routes={'test.alert': 'high', 'test.analytics': 'low'}
+        )
+        self.assertEqual(scheduler.publish('test.alert').lane, 'high')
+        self.assertEqual(scheduler.publish('test.analytics').lane, 'low')
+        self.assertEqual(scheduler.publish('test.other').lane, 'normal')
+        self.assertEqual(scheduler['low'].publish('test.alert').lane, 'low')
+
+        scheduler = self.make_scheduler(
+            routes=lambda name: 'high' if name.startswith('alert.') else None
+        )
+        self.assertEqual(scheduler.publish('alert.disk').lane, 'high')
+        self.assertEqual(scheduler.publish('test.other').lane, 'normal')
+
+    def test_unknown_lane(self):
+        scheduler = self.make_scheduler(routes={'test.alert': 'urgent'})
+        self.assertRaises(ValueError, scheduler.publish, 'test.alert')
+        self.assertEqual(scheduler.publish('test.other').result(), 1)
+
+    def test_weights_must_be_positive(self):
+        for weight in (0, -1):
+            self.assertRaises(
+                ValueError,
+                Scheduler, self.client, weights={'test.publish': weight}
+            )
+
+        scheduler = self.make_scheduler(weights={'test.publish': 0.5})
+        self.assertEqual(scheduler.publish('test.publish').result(), 1)
+
+    def test_fair_queuing_across_topics(self):
+        """
+        A burst on a topic does not delay the other topics of the lane.
+        """
+        scheduler = self.make_scheduler(workers=1, reserved_workers=0)
+        scheduler.publish('test.block')
+        self.wait_sent(1)
+
+        for _ in range(5):
+            scheduler.publish('test.noisy')
+        scheduler.publish('test.quiet')
+        scheduler.publish('test.quiet')
+
+        self.client.release.set()
+        self.assertTrue(scheduler.close(timeout=5))
+        self.assertEqual(self.client.sent[1:], [
+            'test.noisy', 'test.quiet', 'test.noisy', 'test.quiet',
+            'test.noisy', 'test.noisy', 'test.noisy'
+        ])
+
+    def test_weights(self):
+        scheduler = self.make_scheduler(
+            workers=1, reserved_workers=0, weights={'test.heavy': 3}
+        )
+        scheduler.publish('test.block')
+        self.wait_sent(1)
+
+        for _ in range(4):
+            scheduler.publish('test.heavy')
+            scheduler.publish('test.light')
+
+        self.client.release.set()
+        self.assertTrue(scheduler.close(timeout=5))
+        self.assertEqual(self.client.sent[1:], [
+            'test.heavy', 'test.heavy', 'test.heavy', 'test.light',
+            'test.heavy', 'test.light', 'test.light', 'test.light'
+        ])
+
+    def test_strict_priority(self):
+        """
+        Queued requests are sent from the highest priority lane first.
+        """
+        scheduler = self.make_scheduler(workers=1, reserved_workers=0)
+        scheduler.publish('test.block')
+        self.wait_sent(1)
+
+        scheduler['low'].publish('test.low')
+        scheduler['normal'].publish('test.normal')
+        scheduler['high'].publish('test.high')
+
+        self.client.release.set()
+        self.assertTrue(scheduler.close(timeout=5))
+        self.assertEqual(
+            self.client.sent[1:],
+            ['test.high', 'test.normal', 'test.low']
+        )
+
+    def test_high_priority_not_blocked_by_saturated_lanes(self):
+        """
+        High priority requests go through while all the other workers are
+        busy with lower priority ones.
+        """
+        scheduler = self.make_scheduler(workers=3, reserved_workers=1)
+        for _ in range(10):
+            scheduler['low'].publish('test.block')
+        self.wait_sent(2)
+
+        request = scheduler['high'].publish('test.alert')
+        self.assertTrue(request.wait(5))
+        self.assertEqual(
+            self.client.sent,
+            ['test.block', 'test.block', 'test.alert']
+        )
+
+    def test_bounded_lanes(self):
+        """
+        A full lane rejects requests, without affecting the other lanes.
+        """
+        scheduler = self.make_scheduler(
+            workers=2, reserved_workers=1, max_size={
+                'high': 10, 'normal': 10, 'low': 2
+            }
+        )
+        scheduler['low'].publish('test.block')
+        self.wait_sent(1)
+
+        scheduler['low'].publish('test.low')
+        scheduler['low'].publish('test.low')
+        self.assertRaises(
+            ClientQueueFull,
+            scheduler['low'].publish, 'test.low'
+        )
+        self.assertEqual(scheduler['high'].publish('test.alert').result(), 2)
+
+    def test_close(self):
+        scheduler = self.make_scheduler(workers=1, reserved_workers=0)
+        scheduler.publish('test.block')
+        requests = [scheduler.publish('test.publish') for _ in range(3)]
+
+        self.assertFalse(scheduler.close(timeout=0.05))
+        self.assertRaises(ClientQueueFull, scheduler.publish, 'test.publish')
+
+        self.client.release.set()
+        self.assertTrue(scheduler.close(timeout=5))
+        self.assertTrue(all(request.done() for request in requests))
+
+
+class SchedulerRequestsTests(unittest.TestCase):
+    def test_call(self):
+        with StubBridge() as bridge:
+            client = Client(bridge.url + '/call', timeout=5)
+            with Scheduler(client) as scheduler:
+                requests = [
+                    scheduler.call('test.add', i, 1) for i in range(20)
+                ]
+                self.assertEqual(
+                    [request.result() for request in requests],
+                    [i + 1 for i in range(20)]
+                )
@@ -0,0 +1,194 @@
+import json
+import sys
+import unittest
+
+# Mock facility for unit testing.
+try:
+    # Python 3
+    import unittest.mock as mock
+except ImportError:
+    # Python 2
+    import mock
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from crossbarhttp import Client
+from crossbarhttp.streaming import is_streamed, iter_chunks, iter_json
+from crossbarhttp.transport import TCPTransport
+
+from .stub import StubBridge
+
+
+def records(count):
+    for i in range(count):
+        yield {'id': i, 'name': 'record {0}'.format(i), 'tags': ['a', 'b']}
+
+
+class DiscardingTransport(object):
+    """
+    Transport consuming the request body without keeping it, to measure the
+    memory used by the client alone.
+    """
+
+    def __init__(self):
+        self.size = 0
+
+    def send_request(self, request, timeout):
+        for chunk in request.data:
+            self.size += len(chunk)
+        return {'id': 1}
+
+
+class StreamingTests(unittest.TestCase):
+    def test_is_streamed(self):
+        self.assertFalse(is_streamed(None))
+        self.assertFalse(is_streamed({'args': (1, [2]), 'kwargs': {'a': 3}}))
+        self.assertTrue(is_streamed({'args': (records(1),), 'kwargs': {}}))
+        self.assertTrue(is_streamed({'args': (), 'kwargs': {'a': iter([])}}))
+        self.assertTrue(is_streamed({'args': ({'rows': records(1)},)}))
+        self.assertTrue(is_streamed({'kwargs': {'a': [1, iter([])]}}))
+
+    def test_iter_json(self):
+        """
+        Iterators are encoded as JSON arrays, everything else like
+        ``json.dumps`` does.
+        """
+        params = {
+            'topic': 'test.publish',
+            'args': (1, records(3), [records(2), 'x'], iter([])),
+            'kwargs': {'key': {'nested': [1, 2]}, 'empty': iter(())}
+        }
+        expected = {
+            'topic': 'test.publish',
+            'args': [1, list(records(3)), [list(records(2)), 'x'], []],
+            'kwargs': {'key': {'nested': [1, 2]}, 'empty': []}
+        }
+
+        self.assertEqual(json.loads(''.join(iter_json(params))), expected)
+
+        plain = {'args': [1, 2, {'a': None}], 'kwargs': {}}
+        self.assertEqual(''.join(iter_json(plain)), json.dumps(plain))
+
+    def test_iter_json_keys(self):
+        """
+        Keys that are not strings are coerced like ``json.dumps`` does.
+        """
+        value = {1: [1, 2], None: 3, False: 4, 1.5: 5}
+        params = {'args': (dict(value, rows=iter([1, 2])),), 'kwargs': {}}
+        expected = json.loads(json.dumps(
+            {'args': [dict(value, rows=[1, 2])], 'kwargs': {}}
+        ))
+
+        self.assertEqual(json.loads(''.join(iter_json(params))), expected)
+        self.assertRaises(
+            TypeError, list, iter_json({(1, 2): iter([]), 'a': 1})
+        )
+
+    def test_iter_chunks(self):
+        chunks = list(iter_chunks(['ab', 'cd', 'e', u'\u00e9f'], size=3))
+        self.assertEqual(chunks, [b'abcd', u'e\u00e9f'.encode('utf-8')])
+        self.assertEqual(list(iter_chunks([])), [])
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc is not available')
+    @mock.patch('crossbarhttp.streaming.SPOOL_SIZE', 64 * 1024)
+    def test_memory_does_not_grow_with_payload(self):
+        """
+        Peak memory of a streamed publish stays flat when the payload grows.
+        """
+        def peak(count, **kwargs):
+            transport = DiscardingTransport()
+            client = Client(
+                'http://localhost:8001/publish-signed',
+                transport=transport,
+                **kwargs
+            )
+            tracemalloc.start()
+            try:
+                client.publish('test.publish', records(count))
+                return tracemalloc.get_traced_memory()[1], transport.size
+            finally:
+                tracemalloc.stop()
+
+        for kwargs in ({}, {'key': 'key', 'secret': 'secret'}):
+            # Warm up, so lazy imports do not count.
+            peak(10, **kwargs)
+
+            small_peak, small_size = peak(500, **kwargs)
+            large_peak, large_size = peak(25000, **kwargs)
+
+            self.assertTrue(large_size > 40 * small_size)
+            self.assertTrue(
+                large_peak - small_peak < 512 * 1024,
+                (kwargs, small_peak, large_peak)
+            )
+
+
+@unittest.skipIf(sys.version_info < (3, 6), 'Chunked uploads need Python 3.6')
+class StreamingRequestsTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge().start()
+        self.url = self.bridge.url
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def test_publish(self):
+        client = Client(self.url + '/publish', timeout=5)
+        publish_id = client.publish('test.publish', records(1000))
+        self.assertNotEqual(publish_id, None)
+        self.assertEqual(self.bridge.chunked_count, 1)
+
+    def test_publish_nested(self):
+        """
+        Iterators nested in the arguments are streamed too.
+        """
+        client = Client(self.url + '/publish', timeout=5)
+        publish_id = client.publish('test.publish', {'rows': records(1000)})
+        self.assertNotEqual(publish_id, None)
+        self.assertEqual(self.bridge.chunked_count, 1)
+
+    def test_publish_signature(self):
+        client = Client(
+            self.url + '/publish-signed',
+            key='key', secret='secret',
+            timeout=5
+        )
+        publish_id = client.publish('test.publish', records(1000))
+        self.assertNotEqual(publish_id, None)
+        self.assertEqual(self.bridge.chunked_count, 1)
+
+    def test_call(self):
+        client = Client(self.url + '/call', timeout=5)
+        self.assertEqual(client.call('test.length', records(5000)), 5000)
+
+    def test_call_signature_pooled(self):
+        """
+        Streamed requests also work through pooled transports, mixed with
+        regular ones.
+        """
+        client = Client(
+            self.url + '/call-signature',
+            key='key', secret='secret',
+            timeout=5,
+            transport=TCPTransport()
+        )
+        self.assertEqual(client.call('test.add', 2, 3), 5)
+        self.assertEqual(client.call('test.length', records(5000)), 5000)
+        self.assertEqual(client.call('test.length', iter([1, 2])), 2)
+        self.assertEqual(client.call('test.add', 1, 1), 2)
+        self.assertEqual(self.bridge.chunked_count, 2)
+
+    def test_streamed_call_not_hedged(self):
+        client = Client(
+            self.url + '/call',
+            timeout=5,
+            hedge_procedures=['test.length']
+        )
+        client.latency.min_samples = 1
+        client.latency.record('test.length', 0)
+
+        self.assertEqual(client.call('test.length', records(10)), 10)
+        self.assertEqual(self.bridge.request_count, 1)
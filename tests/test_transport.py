@@ -0,0 +1,553 @@
+import os
+import socket
+import ssl
+import time
+import unittest
+
+# Mock facility for unit testing.
+try:
+    # Python 3
+    import unittest.mock as mock
+except ImportError:
+    # Python 2
+    import mock
+
+from crossbarhttp import (
+    Client,
+    ClientBadHost,
+    ClientBadUrl,
+    ClientCallRuntimeError,
+    ClientMissingParams,
+    ClientNoCalleeRegistered,
+    ClientSignatureError
+)
+from crossbarhttp.compat import monotonic, TLS_SESSIONS
+from crossbarhttp.transport import (
+    DNSCache, TCPTransport, UnixSocketTransport
+)
+
+from .stub import CA_FILE, CERT_FILE, StubBridge
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets unavailable')
+class UnixSocketTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge(unix_socket=True).start()
+        self.url = self.bridge.url
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def test_client_instantiation_unix_url(self):
+        """
+        A ``http+unix`` URL makes the client use a ``UnixSocketTransport`` on
+        the percent-decoded socket path.
+        """
+        client = Client(self.url + '/call')
+
+        self.assertTrue(isinstance(client.transport, UnixSocketTransport))
+        self.assertEqual(client.transport.path, self.bridge.socket_path)
+
+    def test_client_instantiation_wrong_unix_url(self):
+        """
+        A ``http+unix`` URL without socket path is not valid.
+        """
+        self.assertRaises(ClientBadUrl, Client, 'http+unix:///call')
+
+    def test_call(self):
+        client = Client(self.url + '/call', timeout=5)
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+
+    def test_publish(self):
+        client = Client(self.url + '/publish', timeout=5)
+        self.assertNotEqual(client.publish('test.publish', 4, 7), None)
+
+    def test_explicit_socket_path(self):
+        """
+        The socket path can be given apart from a regular ``http`` URL.
+        """
+        client = Client(
+            'http://localhost/call',
+            unix_socket=self.bridge.socket_path,
+            timeout=5
+        )
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+
+    def test_connection_reused(self):
+        """
+        Consecutive requests go through the same pooled connection.
+        """
+        client = Client(self.url + '/publish', timeout=5)
+        client.publish('test.publish', 1)
+        connection = client.transport._idle[self.bridge.socket_path][0]
+
+        client.publish('test.publish', 2)
+        self.assertEqual(
+            client.transport._idle[self.bridge.socket_path],
+            [connection]
+        )
+
+    def test_stale_connection_retried(self):
+        """
+        A pooled connection closed while idle is replaced transparently.
+        """
+        client = Client(self.url + '/publish', timeout=5)
+        client.publish('test.publish', 1)
+        connection = client.transport._idle[self.bridge.socket_path][0]
+        connection.sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertNotEqual(client.publish('test.publish', 2), None)
+        self.assertEqual(self.bridge.request_count, 2)
+
+    def test_dropped_request_not_retried(self):
+        """
+        A request is not sent again if the connection is dropped once the
+        server has read it, since it may have been processed.
+        """
+        client = Client(self.url + '/publish', timeout=5)
+        client.publish('test.publish', 1)
+
+        self.assertRaises(ClientBadHost, client.publish, 'test.drop', 2)
+        self.assertEqual(self.bridge.request_count, 2)
+
+    def test_call_no_callee(self):
+        client = Client(self.url + '/call', timeout=5)
+        self.assertRaises(
+            ClientNoCalleeRegistered,
+            client.call, 'test.does_not_exist', 2, 3, offset=10
+        )
+
+    def test_call_exception(self):
+        client = Client(self.url + '/call', timeout=5)
+        self.assertRaises(
+            ClientCallRuntimeError,
+            client.call, 'test.exception'
+        )
+
+    def test_call_bad_url(self):
+        client = Client(self.url + '/call_bad_url', timeout=5)
+        self.assertRaises(
+            ClientBadUrl,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_bad_host(self):
+        client = Client(
+            'http://localhost/call',
+            unix_socket=os.path.join(self.bridge._tmpdir, 'missing.sock'),
+            timeout=5
+        )
+        self.assertRaises(
+            ClientBadHost,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_missing_signature_params(self):
+        client = Client(self.url + '/call-signature', timeout=5)
+        self.assertRaises(
+            ClientMissingParams,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_bad_signature(self):
+        client = Client(
+            self.url + '/call-signature',
+            key='key', secret='bad secret',
+            timeout=5
+        )
+        self.assertRaises(
+            ClientSignatureError,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_signature(self):
+        client = Client(
+            self.url + '/call-signature',
+            key='key', secret='secret',
+            timeout=5
+        )
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+        self.assertEqual(client.call('test.add', 1, 1), 2)
+
+
+class TCPTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge().start()
+        self.url = self.bridge.url
+        self.transport = TCPTransport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.bridge.stop()
+
+    def test_call(self):
+        client = Client(
+            self.url + '/call', timeout=5, transport=self.transport
+        )
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+
+    def test_publish(self):
+        client = Client(
+            self.url + '/publish', timeout=5, transport=self.transport
+        )
+        self.assertNotEqual(client.publish('test.publish', 4, 7), None)
+
+    def test_connections_pooled_per_origin(self):
+        """
+        Connections to different nodes are kept in different pools.
+        """
+        other = StubBridge().start()
+        self.addCleanup(other.stop)
+
+        Client(self.url + '/publish', transport=self.transport).publish('a')
+        Client(other.url + '/publish', transport=self.transport).publish('b')
+
+        self.assertEqual(
+            sorted(self.transport._idle),
+            sorted([
+                ('http', '127.0.0.1', self.bridge.server.server_address[1]),
+                ('http', '127.0.0.1', other.server.server_address[1]),
+            ])
+        )
+
+    def test_connection_reused_high_file_descriptors(self):
+        """
+        Idle connections are reused when their file descriptors are beyond
+        the reach of ``select``, like in processes with many connections.
+        """
+        # New sockets take the lowest free file descriptor, so the ones of
+        # the connections come after the fillers.
+        fillers = []
+        self.addCleanup(lambda: [filler.close() for filler in fillers])
+        try:
+            while not fillers or fillers[-1].fileno() < 1100:
+                fillers.append(socket.socket())
+        except socket.error:
+            self.skipTest('Not enough file descriptors available')
+
+        client = Client(
+            self.url + '/call', timeout=5, transport=self.transport
+        )
+        with mock.patch.object(
+                self.transport, '_new_connection',
+                wraps=self.transport._new_connection) as new_connection:
+            for i in range(10):
+                self.assertEqual(client.call('test.add', i, 1), i + 1)
+
+        self.assertEqual(new_connection.call_count, 1)
+
+    def test_client_close(self):
+        """
+        Closing the client closes the idle connections of its transport.
+        """
+        with Client(
+            self.url + '/call', timeout=5, transport=self.transport
+        ) as client:
+            client.call('test.add', 2, 3)
+            self.assertTrue(self.transport._idle)
+
+        self.assertEqual(self.transport._idle, {})
+
+    def test_hedged_call_cancelled(self):
+        """
+        Once the hedged request answered, the slow one stops waiting for its
+        response.
+        """
+        delay = 2
+        slow = StubBridge(delay=delay).start()
+        self.addCleanup(slow.stop)
+
+        client = Client(
+            slow.url + '/call',
+            timeout=5,
+            transport=self.transport,
+            hedge_procedures=['test.add'],
+            hedge_urls=[self.url + '/call']
+        )
+        client.latency.min_samples = 1
+        client.latency.record('test.add', 0.05)
+
+        finished = []
+        make_api_call = client._make_api_call
+
+        def api_call(*args, **kwargs):
+            try:
+                return make_api_call(*args, **kwargs)
+            finally:
+                finished.append(monotonic())
+
+        client._make_api_call = api_call
+
+        started = monotonic()
+        self.assertEqual(client.call('test.add', 2, 3), 5)
+        while len(finished) < 2 and monotonic() - started < delay * 2:
+            time.sleep(0.01)
+
+        self.assertEqual(len(finished), 2)
+        self.assertTrue(max(finished) - started < delay / 2.0)
+
+    def test_cancelled_before_sent(self):
+        cancellation = self.transport.cancellation()
+        cancellation.cancel()
+
+        client = Client(
+            self.url + '/call', timeout=5, transport=self.transport
+        )
+        self.assertRaises(
+            ClientBadHost, client._make_api_call, 'POST', client.url,
+            json_params={'procedure': 'test.add', 'args': [2, 3]},
+            cancellation=cancellation
+        )
+        self.assertEqual(self.bridge.request_count, 0)
+
+    def test_call_bad_url(self):
+        client = Client(
+            self.url + '/call_bad_url', timeout=5, transport=self.transport
+        )
+        self.assertRaises(
+            ClientBadUrl,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_bad_host(self):
+        client = Client(
+            'http://127.0.0.1:1/call', timeout=5, transport=self.transport
+        )
+        self.assertRaises(
+            ClientBadHost,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_call_signature(self):
+        client = Client(
+            self.url + '/call-signature',
+            key='key', secret='secret',
+            timeout=5,
+            transport=self.transport
+        )
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+
+
+class TLSTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge(tls=True).start()
+        self.url = self.bridge.url + '/call'
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def test_client_instantiation(self):
+        """
+        TLS options make the client use a pooled transport.
+        """
+        client = Client(self.url, cafile=CA_FILE, certfile=CERT_FILE)
+        self.assertTrue(isinstance(client.transport, TCPTransport))
+        self.assertEqual(client.transport.cafile, CA_FILE)
+        self.assertEqual(client.transport.certfile, CERT_FILE)
+
+    def test_call(self):
+        client = Client(self.url, cafile=CA_FILE, timeout=5)
+        self.assertEqual(client.call('test.add', 2, 3, offset=10), 15)
+        self.assertEqual(client.call('test.add', 1, 1), 2)
+
+        # A single handshake for both requests.
+        self.assertEqual(self.bridge.handshake_count, 1)
+
+    def test_warmed_up_connections_reused(self):
+        """
+        Warmed up connections are reused, even with TLS messages, like
+        session tickets, pending on them.
+        """
+        client = Client(self.url, cafile=CA_FILE, timeout=5)
+        self.assertEqual(client.warmup(2), 2)
+        time.sleep(0.1)
+
+        with mock.patch.object(
+                client.transport, '_new_connection') as new_connection_mock:
+            self.assertEqual(client.call('test.add', 2, 3), 5)
+            self.assertFalse(new_connection_mock.called)
+
+    def test_call_untrusted_certificate(self):
+        client = Client(self.url, dns_ttl=60, timeout=5)
+        self.assertRaises(
+            ClientBadHost,
+            client.call, 'test.add', 2, 3, offset=10
+        )
+
+    def test_shared_ssl_context(self):
+        context = ssl.create_default_context(cafile=CA_FILE)
+        clients = [
+            Client(self.url, ssl_context=context, timeout=5)
+            for _ in range(2)
+        ]
+
+        for client in clients:
+            self.assertTrue(client.transport.ssl_context is context)
+            self.assertEqual(client.call('test.add', 2, 3), 5)
+
+    @unittest.skipUnless(TLS_SESSIONS, 'TLS session resumption unavailable')
+    def test_sessions_resumed(self):
+        """
+        New connections resume the TLS session of the previous ones.
+        """
+        # Without idle connections, every request opens a new one.
+        transport = TCPTransport(pool_size=0, cafile=CA_FILE)
+        client = Client(self.url, transport=transport, timeout=5)
+
+        for i in range(5):
+            self.assertEqual(client.call('test.add', i, 1), i + 1)
+
+        self.assertEqual(self.bridge.handshake_count, 5)
+        self.assertEqual(self.bridge.resumed_count, 4)
+
+    def test_sessions_not_resumed(self):
+        transport = TCPTransport(
+            pool_size=0, cafile=CA_FILE, resume_sessions=False
+        )
+        client = Client(self.url, transport=transport, timeout=5)
+
+        for i in range(3):
+            self.assertEqual(client.call('test.add', i, 1), i + 1)
+
+        self.assertEqual(self.bridge.handshake_count, 3)
+        self.assertEqual(self.bridge.resumed_count, 0)
+
+    def test_client_certificate(self):
+        bridge = StubBridge(tls=True, client_certs=True).start()
+        self.addCleanup(bridge.stop)
+        url = bridge.url + '/call'
+
+        client = Client(url, cafile=CA_FILE, timeout=5)
+        self.assertRaises(ClientBadHost, client.call, 'test.add', 2, 3)
+
+        client = Client(url, cafile=CA_FILE, certfile=CERT_FILE, timeout=5)
+        self.assertEqual(client.call('test.add', 2, 3), 5)
+
+
+class DNSCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = DNSCache(ttl=60)
+        self.addresses = socket.getaddrinfo(
+            '127.0.0.1', 8001, 0, socket.SOCK_STREAM
+        )
+
+    @mock.patch('socket.getaddrinfo')
+    def test_resolve_cached(self, getaddrinfo_mock):
+        getaddrinfo_mock.return_value = self.addresses
+
+        self.assertEqual(self.cache.resolve('node', 8001), self.addresses)
+        self.assertEqual(self.cache.resolve('node', 8001), self.addresses)
+        self.assertEqual(getaddrinfo_mock.call_count, 1)
+
+        self.cache.resolve('node', 8002)
+        self.assertEqual(getaddrinfo_mock.call_count, 2)
+
+    @mock.patch('crossbarhttp.transport.monotonic')
+    @mock.patch('socket.getaddrinfo')
+    def test_resolve_expired(self, getaddrinfo_mock, monotonic_mock):
+        getaddrinfo_mock.return_value = self.addresses
+        monotonic_mock.return_value = 100
+
+        self.cache.resolve('node', 8001)
+        monotonic_mock.return_value = 159
+        self.cache.resolve('node', 8001)
+        self.assertEqual(getaddrinfo_mock.call_count, 1)
+
+        monotonic_mock.return_value = 161
+        self.cache.resolve('node', 8001)
+        self.assertEqual(getaddrinfo_mock.call_count, 2)
+
+    @mock.patch('socket.getaddrinfo')
+    def test_resolve_error_not_cached(self, getaddrinfo_mock):
+        getaddrinfo_mock.side_effect = socket.gaierror('Name not known')
+        self.assertRaises(socket.gaierror, self.cache.resolve, 'node', 8001)
+
+        getaddrinfo_mock.side_effect = None
+        getaddrinfo_mock.return_value = self.addresses
+        self.assertEqual(self.cache.resolve('node', 8001), self.addresses)
+
+    def test_unreachable_address_invalidated(self):
+        """
+        The cached addresses of a host are forgotten when none of them can be
+        connected to.
+        """
+        transport = TCPTransport()
+        client = Client('http://127.0.0.1:1/call', transport=transport)
+
+        self.assertRaises(ClientBadHost, client.call, 'test.add', 2, 3)
+        self.assertEqual(transport.dns_cache._entries, {})
+
+
+class WarmupTests(unittest.TestCase):
+    def setUp(self):
+        self.bridge = StubBridge().start()
+        self.url = self.bridge.url + '/publish'
+
+    def tearDown(self):
+        self.bridge.stop()
+
+    def idle_connections(self, client):
+        return sum(len(idle) for idle in client.transport._idle.values())
+
+    def test_client_instantiation(self):
+        """
+        ``dns_ttl`` and ``warmup`` make the client use a pooled transport.
+        """
+        self.assertEqual(Client(self.url).transport, None)
+
+        client = Client(self.url, dns_ttl=300)
+        self.assertTrue(isinstance(client.transport, TCPTransport))
+        self.assertEqual(client.transport.dns_cache.ttl, 300)
+
+        client = Client(self.url, warmup=8)
+        self.assertTrue(isinstance(client.transport, TCPTransport))
+        self.assertEqual(client.transport.pool_size, 8)
+        self.assertEqual(client.transport.dns_cache.ttl, 60)
+
+    @mock.patch('socket.getaddrinfo', wraps=socket.getaddrinfo)
+    def test_warmup(self, getaddrinfo_mock):
+        """
+        Warmed up connections are reused by the following requests, and the
+        host name is resolved only once.
+        """
+        client = Client(self.url, timeout=5, dns_ttl=60)
+
+        self.assertEqual(client.warmup(3), 3)
+        self.assertEqual(self.idle_connections(client), 3)
+        self.assertEqual(self.bridge.request_count, 0)
+
+        with mock.patch.object(
+                client.transport, '_new_connection') as new_connection_mock:
+            client.publish('test.publish', 1)
+            client.publish('test.publish', 2)
+            self.assertFalse(new_connection_mock.called)
+
+        self.assertEqual(self.idle_connections(client), 3)
+        self.assertEqual(getaddrinfo_mock.call_count, 1)
+
+    def test_warmup_hedge_urls(self):
+        other = StubBridge().start()
+        self.addCleanup(other.stop)
+
+        client = Client(
+            self.url, dns_ttl=60, hedge_urls=[self.url, other.url + '/publish']
+        )
+        self.assertEqual(client.warmup(2), 4)
+        self.assertEqual(len(client.transport._idle), 2)
+
+    def test_warmup_in_background(self):
+        client = Client(self.url, timeout=5, warmup=2)
+
+        deadline = time.time() + 5
+        while self.idle_connections(client) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(self.idle_connections(client), 2)
+
+    def test_warmup_bad_host(self):
+        client = Client('http://127.0.0.1:1/publish', timeout=5, dns_ttl=60)
+        self.assertRaises(ClientBadHost, client.warmup, 2)
+
+    def test_warmup_without_pool(self):
+        client = Client(self.url)
+        self.assertEqual(client.warmup(2), 0)